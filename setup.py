@@ -10,11 +10,11 @@ setup(
         'humanize>=0.5',
         'iteration_utilities==0.11.0',
         'dnspython>=2.2.0',
-        'backports.functools-lru-cache>=1.6.4',
         'PyYaml'
     ],
     name='yclienttools',
     packages=['yclienttools'],
+    python_requires='>=3.7',
     entry_points={
         'console_scripts': [
             'yreport_dataobjectspercollection= yclienttools.reportdoc:entry',
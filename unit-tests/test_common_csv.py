@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for common CSV output functions
+"""
+
+__copyright__ = 'Copyright (c) 2019-2024, Utrecht University'
+__license__   = 'GPLv3, see LICENSE'
+
+import csv
+from io import StringIO
+import sys
+from unittest import TestCase
+from unittest.mock import patch
+
+sys.path.append("../yclienttools")
+
+from common_csv import buffered_stdout, format_csv_row  # type: ignore[import-not-found]
+
+
+class CommonCsvTest(TestCase):
+    def _csv_writer_output(self, row):
+        output = StringIO()
+        csv.writer(output, delimiter=',').writerow(row)
+        return output.getvalue()
+
+    def test_format_plain_row(self):
+        row = ["research-test", "category", "2024-01-01", "123"]
+        self.assertEqual(format_csv_row(row), "research-test,category,2024-01-01,123\r\n")
+        self.assertEqual(format_csv_row(row), self._csv_writer_output(row))
+
+    def test_format_row_with_special_characters(self):
+        row = ["with,comma", 'with "quotes"', "with\nnewline", "with\rreturn", "a;b", ""]
+        self.assertEqual(format_csv_row(row), self._csv_writer_output(row))
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_buffered_stdout_without_file_descriptor(self, mock_stdout):
+        with buffered_stdout() as output:
+            output.write(format_csv_row(["a", "b"]))
+        self.assertEqual(mock_stdout.getvalue(), "a,b\r\n")
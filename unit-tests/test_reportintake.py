@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the dataset statistics cache of the intake report
+"""
+
+__copyright__ = 'Copyright (c) 2019-2024, Utrecht University'
+__license__   = 'GPLv3, see LICENSE'
+
+import csv
+import os
+import sys
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+sys.path.append("../yclienttools")
+
+from reportintake import DatasetStatisticsCache  # type: ignore[import-not-found]
+
+
+class DatasetStatisticsCacheTest(TestCase):
+    def _write_legacy_file(self, cache_dir):
+        legacy_filename = os.path.join(cache_dir, "dsscache.1700000000.dat")
+        with open(legacy_filename, "w", newline="") as legacy_file:
+            csv.writer(legacy_file).writerows([["/z/home/a", 1, 2], ["/z/home/b,c", 3, 4]])
+        return legacy_filename
+
+    def _round_trip(self, entries):
+        with TemporaryDirectory() as cache_dir:
+            cache = DatasetStatisticsCache(cache_dir)
+            for path, num, size in entries:
+                cache.put(path, num, size)
+            cache.save()
+
+            reloaded_cache = DatasetStatisticsCache(cache_dir)
+            for path, num, size in entries:
+                self.assertTrue(reloaded_cache.has(path))
+                self.assertEqual(reloaded_cache.get(path), (num, size))
+
+    def test_round_trip_plain_paths(self):
+        self._round_trip([("/z/home/grp-vault-test/ds1", 1, 2),
+                          ("/z/home/grp-vault-test/ds 2", 3, 4)])
+
+    def test_round_trip_special_paths(self):
+        self._round_trip([("/z/home/a,b", 1, 2),
+                          ('/z/home/a"b', 3, 4),
+                          ("/z/home/a\nb", 5, 6),
+                          ("/z/home/a\rb", 7, 8),
+                          ("/z/home/a\r\nb,\"c\"", 9, 10)])
+
+    def test_append_to_existing_cache(self):
+        with TemporaryDirectory() as cache_dir:
+            cache = DatasetStatisticsCache(cache_dir)
+            cache.put("/z/home/a", 1, 2)
+            cache.save()
+
+            cache = DatasetStatisticsCache(cache_dir)
+            cache.put("/z/home/b\nc", 3, 4)
+            cache.save()
+
+            reloaded_cache = DatasetStatisticsCache(cache_dir)
+            self.assertEqual(reloaded_cache.get("/z/home/a"), (1, 2))
+            self.assertEqual(reloaded_cache.get("/z/home/b\nc"), (3, 4))
+
+    def test_malformed_lines_are_skipped(self):
+        with TemporaryDirectory() as cache_dir:
+            with open(os.path.join(cache_dir, DatasetStatisticsCache.CACHE_FILENAME), "w") as cache_file:
+                cache_file.write("/z/home/a,1,2\n/z/home/b,x,4\n/z/home/c\n/z/home/d,5,6\n/z/home/e,7")
+
+            cache = DatasetStatisticsCache(cache_dir)
+            self.assertEqual(cache.get("/z/home/a"), (1, 2))
+            self.assertEqual(cache.get("/z/home/d"), (5, 6))
+            self.assertFalse(cache.has("/z/home/b"))
+            self.assertFalse(cache.has("/z/home/c"))
+            self.assertFalse(cache.has("/z/home/e"))
+
+    def test_truncated_quoted_path(self):
+        with TemporaryDirectory() as cache_dir:
+            with open(os.path.join(cache_dir, DatasetStatisticsCache.CACHE_FILENAME), "w") as cache_file:
+                cache_file.write('/z/home/a,1,2\n"/z/home/b\n')
+
+            cache = DatasetStatisticsCache(cache_dir)
+            self.assertEqual(cache.get("/z/home/a"), (1, 2))
+            self.assertFalse(cache.has("/z/home/b\n"))
+
+    def _save_after_truncated_entry(self, truncated_content):
+        with TemporaryDirectory() as cache_dir:
+            with open(os.path.join(cache_dir, DatasetStatisticsCache.CACHE_FILENAME), "w") as cache_file:
+                cache_file.write(truncated_content)
+
+            cache = DatasetStatisticsCache(cache_dir)
+            cache.put("/z/new", 5, 6)
+            cache.save()
+            cache.put("/z/new2", 7, 8)
+            cache.save()
+
+            for reloaded_cache in [DatasetStatisticsCache(cache_dir), DatasetStatisticsCache(cache_dir)]:
+                self.assertEqual(reloaded_cache.get("/z/a"), (1, 2))
+                self.assertEqual(reloaded_cache.get("/z/new"), (5, 6))
+                self.assertEqual(reloaded_cache.get("/z/new2"), (7, 8))
+
+    def test_save_after_truncated_quoted_entry(self):
+        self._save_after_truncated_entry('/z/a,1,2\n"/z/b,c')
+
+    def test_save_after_truncated_unquoted_entry(self):
+        self._save_after_truncated_entry("/z/a,1,2\n/z/b,3")
+
+    def test_save_after_entry_without_newline(self):
+        self._save_after_truncated_entry("/z/a,1,2")
+
+    def test_legacy_cache_files_are_merged(self):
+        with TemporaryDirectory() as cache_dir:
+            legacy_filename = self._write_legacy_file(cache_dir)
+
+            cache = DatasetStatisticsCache(cache_dir)
+            self.assertEqual(cache.get("/z/home/a"), (1, 2))
+            self.assertEqual(cache.get("/z/home/b,c"), (3, 4))
+            self.assertFalse(os.path.exists(legacy_filename))
+
+            reloaded_cache = DatasetStatisticsCache(cache_dir)
+            self.assertEqual(reloaded_cache.get("/z/home/b,c"), (3, 4))
+
+    @patch('os.access', return_value=False)
+    def test_legacy_cache_files_in_read_only_directory(self, mock_access):
+        with TemporaryDirectory() as cache_dir:
+            legacy_filename = self._write_legacy_file(cache_dir)
+
+            cache = DatasetStatisticsCache(cache_dir)
+            self.assertEqual(cache.get("/z/home/b,c"), (3, 4))
+            self.assertTrue(os.path.exists(legacy_filename))
+            self.assertFalse(os.path.exists(cache.filename))
+
+    @patch('sys.stderr', new_callable=StringIO)
+    def test_failed_merge_of_legacy_cache_files(self, mock_stderr):
+        with TemporaryDirectory() as cache_dir:
+            legacy_filename = self._write_legacy_file(cache_dir)
+
+            with patch('os.replace', side_effect=PermissionError("denied")):
+                cache = DatasetStatisticsCache(cache_dir)
+            self.assertEqual(cache.get("/z/home/a"), (1, 2))
+            self.assertTrue(os.path.exists(legacy_filename))
+            self.assertIn("Warning", mock_stderr.getvalue())
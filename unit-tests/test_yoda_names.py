@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the validation functions of Yoda names
+"""
+
+__copyright__ = 'Copyright (c) 2019-2024, Utrecht University'
+__license__   = 'GPLv3, see LICENSE'
+
+import re
+import sys
+from datetime import date, timedelta
+from unittest import TestCase
+
+sys.path.append("../yclienttools")
+
+from yoda_names import is_email, is_internal_user, is_valid_expiration_date  # type: ignore[import-not-found]
+
+
+class YodaNamesTest(TestCase):
+    def test_is_email(self):
+        self.assertTrue(is_email("a@uu.nl"))
+        self.assertTrue(is_email("first.last@sub.uu.nl"))
+        self.assertTrue(is_email("a@b.c"))
+        # Accepted by the original pattern as well, since the second @ precedes the dot
+        self.assertTrue(is_email("a@@.com"))
+        self.assertFalse(is_email("researcher"))
+        self.assertFalse(is_email("a@b."))
+        self.assertFalse(is_email("a@.com"))
+        self.assertFalse(is_email("x@b..c"))
+        self.assertFalse(is_email("a.b@c"))
+
+    def test_is_email_matches_pattern(self):
+        # is_email should accept exactly the names that the original pattern accepted
+        pattern = re.compile(r"@.*[^\.]+\.[^\.]+$")
+        names = ["a@uu.nl", "a@@.com", "a@b.", "a@.com", "x@b..c", "a.b@c", "@a.b",
+                 "a@b.c.", "a@b..", "a@b@c.d", "a.@b", "a@.b.c", "a@..b", "", "@", ".", "a@b.c"]
+        for name in names:
+            self.assertEqual(is_email(name), pattern.search(name) is not None, name)
+
+    def test_is_internal_user(self):
+        self.assertTrue(is_internal_user("a@uu.nl", {"uu.nl"}))
+        self.assertTrue(is_internal_user("a@uu.nl", {"example.org", "uu.nl"}))
+        self.assertFalse(is_internal_user("a@uuxnl", {"uu.nl"}))
+        self.assertFalse(is_internal_user("a@students.uu.nl", {"uu.nl"}))
+        self.assertFalse(is_internal_user("uu.nl", {"uu.nl"}))
+        self.assertFalse(is_internal_user("a@uu.nl", frozenset()))
+
+    def test_is_valid_expiration_date(self):
+        self.assertTrue(is_valid_expiration_date(""))
+        self.assertTrue(is_valid_expiration_date("."))
+        self.assertTrue(is_valid_expiration_date("2999-01-05"))
+        self.assertTrue(is_valid_expiration_date((date.today() + timedelta(days=1)).isoformat()))
+        self.assertFalse(is_valid_expiration_date(date.today().isoformat()))
+        self.assertFalse(is_valid_expiration_date("2000-01-05"))
+        self.assertFalse(is_valid_expiration_date("2999-1-5"))
+        self.assertFalse(is_valid_expiration_date("29990105"))
+        self.assertFalse(is_valid_expiration_date("2999-02-30"))
+        self.assertFalse(is_valid_expiration_date("tomorrow"))
@@ -5,10 +5,16 @@ __license__   = 'GPLv3, see LICENSE'
 
 from unittest import makeSuite, TestSuite
 
+from test_common_csv import CommonCsvTest
 from test_importgroups import ImportGroupsTest
+from test_reportintake import DatasetStatisticsCacheTest
+from test_yoda_names import YodaNamesTest
 
 
 def suite():
     test_suite = TestSuite()
+    test_suite.addTest(makeSuite(CommonCsvTest))
     test_suite.addTest(makeSuite(ImportGroupsTest))
+    test_suite.addTest(makeSuite(DatasetStatisticsCacheTest))
+    test_suite.addTest(makeSuite(YodaNamesTest))
     return test_suite
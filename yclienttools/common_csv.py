@@ -0,0 +1,48 @@
+"""This file contains common functions for writing CSV reports to standard output"""
+
+import contextlib
+import io
+import sys
+from typing import Iterable, Iterator, TextIO
+
+STDOUT_BUFFER_SIZE = 1 << 20
+
+
+@contextlib.contextmanager
+def buffered_stdout(buffer_size: int = STDOUT_BUFFER_SIZE) -> Iterator[TextIO]:
+    """Provides a text stream for standard output with a large buffer, so that
+       report rows are not written to standard output one line at a time. The
+       stream is flushed when the context is exited.
+
+       :param buffer_size: size of the output buffer in bytes
+
+       :returns: text stream to write output to
+    """
+    sys.stdout.flush()
+    try:
+        fileno = sys.stdout.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        yield sys.stdout
+        return
+
+    with open(fileno, "w", buffering=buffer_size, encoding=sys.stdout.encoding,
+              errors=sys.stdout.errors, newline="", closefd=False) as output:
+        yield output
+
+
+def format_csv_row(row: Iterable[str]) -> str:
+    """Formats a row of fields in the same way as csv.writer does with its default
+       dialect. Fields are only quoted if they contain a comma, quote or line break.
+
+       :param row: fields of the row
+
+       :returns: formatted row, including line terminator
+    """
+    return ",".join(map(_escape_csv_field, row)) + "\r\n"
+
+
+def _escape_csv_field(field: str) -> str:
+    if "," in field or '"' in field or "\n" in field or "\r" in field:
+        return '"' + field.replace('"', '""') + '"'
+    else:
+        return field
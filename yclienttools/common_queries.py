@@ -1,7 +1,8 @@
+from collections import defaultdict
 import datetime
 from itertools import chain
 import os
-from typing import Dict, Union
+from typing import AbstractSet, Dict, Optional, Union
 
 from irods.column import Like
 from irods.models import Collection, DataObject, Resource, User, UserGroup
@@ -12,28 +13,34 @@ from yclienttools.options import GroupByOption
 
 def get_collections_in_root(session, root):
     '''Get a generator of collections within a root collection, including the root collection itself.'''
+    return _query_in_collection_tree(session.query(Collection.id, Collection.name), root)
+
+
+def _query_in_collection_tree(query, root):
+    '''Get a generator of results of a query, limited to a root collection and its subcollections.
+       This needs two queries, regardless of the number of subcollections. The query itself is not
+       modified, so it can be reused for other root collections.'''
 
     if root.endswith("/"):
         searchstring = "{}%%".format(root)
     else:
         searchstring = "{}/%%".format(root)
 
-    generator_collection = (session.query(Collection.id, Collection.name)
-                            .filter(Collection.name == root)
-                            .get_results()
-                            )
-    generator_subcollections = (session.query(Collection.id, Collection.name)
-                                .filter(Like(Collection.name, searchstring))
-                                .get_results()
-                                )
-    return chain(generator_collection, generator_subcollections)
+    generator_root = (query
+                      .filter(Collection.name == root)
+                      .get_results())
+    generator_sub = (query
+                     .filter(Like(Collection.name, searchstring))
+                     .get_results())
+    return chain(generator_root, generator_sub)
 
 
 def get_collection_size(session: iRODSSession,
                         collection_name: str,
                         count_all_replicas: bool,
                         group_by: GroupByOption,
-                        include_revisions: bool) -> Dict[str, int]:
+                        include_revisions: bool,
+                        revision_collections: Optional[AbstractSet[str]] = None) -> Dict[str, int]:
     '''Get total size of all data objects in collection (including its subcollections).
        Options:
        - count_all_replicas (boolean): specifies whether to count the size of each data
@@ -43,59 +50,57 @@ def get_collection_size(session: iRODSSession,
          so group_by should be set to GroupByOption.none in that case.
        - include_revisions: specifies whether to include the size of the revision
          collection in the collection size.
+       - revision_collections: optional set of names of existing revision collections
+         (see get_revision_collections). If provided, it is used instead of a query to
+         check whether the revision collection exists.
     '''
 
-    result: Dict[str, int] = {}
-
-    collections = get_collections_in_root(
-        session, collection_name)
+    result: Dict[str, int] = defaultdict(int)
 
-    if len(list(collections)) == 0:
+    # Only the first result is needed to determine whether the collection exists.
+    if next(get_collections_in_root(session, collection_name), None) is None:
         raise exceptions.NotFoundException
 
-    original_collections = get_collections_in_root(
-        session, collection_name)
+    root_collections = [collection_name]
     revision_collection_name = get_revision_collection_name(
-        session, collection_name)
+        session, collection_name, revision_collections) if include_revisions else None
+    if revision_collection_name is not None:
+        root_collections.append(revision_collection_name)
+
+    # The column to group by is determined once, rather than for each result.
+    if group_by == GroupByOption.none:
+        key_column = None
+    elif group_by == GroupByOption.resource:
+        key_column = Resource.name
+    elif group_by == GroupByOption.location:
+        key_column = Resource.location
+    else:
+        raise Exception("Unknown group_by value {}".format(group_by))
 
-    if revision_collection_name is None or not include_revisions:
-        all_collections = original_collections
+    if count_all_replicas:
+        # The sizes of all replicas are summed up by the server, so only one row
+        # per group (resource or location) needs to be retrieved.
+        size_query = session.query(DataObject.size if key_column is None else key_column).sum(DataObject.size)
     else:
-        revision_collections = get_collections_in_root(
-            session, revision_collection_name)
-        all_collections = chain(
-            original_collections, revision_collections)
-
-    for collection in all_collections:
-        if count_all_replicas:
-            dataobjects = (session.query(Collection.name, DataObject.name, DataObject.size,
-                                         DataObject.path, Resource.name, Resource.location)
-                           .filter(Collection.name == collection[Collection.name])
-                           .get_results())
-        else:
-            dataobjects = (session.query(Collection.name, DataObject.name, DataObject.size)
-                           .filter(Collection.name == collection[Collection.name])
-                           .get_results())
+        # Query results are distinct, so this yields the size of each data object once,
+        # unless its replicas have different sizes.
+        size_query = session.query(DataObject.id, DataObject.size)
+
+    for root_collection in root_collections:
+        dataobjects = _query_in_collection_tree(size_query, root_collection)
         for dataobject in dataobjects:
+            size = dataobject[DataObject.size]
+            # A sum over zero data objects has an empty value.
+            if size in (None, ""):
+                continue
 
-            if group_by == GroupByOption.none:
-                key = 'all'
-            elif group_by == GroupByOption.resource:
-                key = dataobject[Resource.name]
-            elif group_by == GroupByOption.location:
-                key = dataobject[Resource.location]
-            else:
-                raise Exception("Unknown group_by value {}".format(key))
-
-            if key in result:
-                result[key] = result[key] + dataobject[DataObject.size]
-            else:
-                result[key] = dataobject[DataObject.size]
+            key = 'all' if key_column is None else dataobject[key_column]
+            result[key] += int(size)
 
     if len(result.keys()) == 0:
         result['all'] = 0
 
-    return result
+    return dict(result)
 
 
 def get_collection_contents_last_modified(session: iRODSSession, collection_name: str) -> Union[None, datetime.datetime]:
@@ -137,8 +142,19 @@ def get_collection_contents_last_modified(session: iRODSSession, collection_name
     return last_timestamp
 
 
-def get_revision_collection_name(session, collection_name):
-    '''Returns the revision collection name of a collection if it exists, otherwise None. '''
+def get_revision_collections(session):
+    '''Returns a set of the names of all revision collections of top-level collections.'''
+    revisions_collection = "/{}/yoda/revisions".format(session.zone)
+    collections = (session.query(Collection.name)
+                   .filter(Collection.parent_name == revisions_collection)
+                   .get_results())
+    return frozenset(c[Collection.name] for c in collections)
+
+
+def get_revision_collection_name(session, collection_name, revision_collections=None):
+    '''Returns the revision collection name of a collection if it exists, otherwise None.
+       If a set of existing revision collections is provided, it is used instead of a query
+       to check whether the revision collection exists.'''
     expected_prefix = "/{}/home/".format(session.zone)
     if collection_name.startswith(expected_prefix):
         trimmed_collection_name = collection_name.replace(
@@ -148,7 +164,11 @@ def get_revision_collection_name(session, collection_name):
         else:
             revision_collection_name = "/{}/yoda/revisions/{}".format(
                 session.zone, trimmed_collection_name)
-            if collection_exists(session, revision_collection_name):
+            if revision_collections is None:
+                revision_collection_exists = collection_exists(session, revision_collection_name)
+            else:
+                revision_collection_exists = revision_collection_name in revision_collections
+            if revision_collection_exists:
                 return revision_collection_name
             else:
                 return None
@@ -158,43 +178,61 @@ def get_revision_collection_name(session, collection_name):
 
 def get_dataobject_count(session, collection_name):
     '''Returns the number of data objects in a collection (including its subcollections).'''
-    return len(get_dataobjects_in_collection(session, collection_name))
+    return sum(1 for _ in get_dataobjects_in_collection(session, collection_name))
 
 
 def get_dataobjects_in_collection(session, collection_name):
-    result = []
-
-    for collection in get_collections_in_root(session, collection_name):
-        dataobjects = (session.query(Collection.name, DataObject.name)
-                       .filter(Collection.name == collection[Collection.name])
-                       .get_results())
-        result.extend(map(
-            lambda d: "{}/{}".format(d[Collection.name], d[DataObject.name]),
-            dataobjects))
-
-    return result
+    '''Returns a generator of the paths of all data objects in a collection (including its subcollections).'''
+    return ("{}/{}".format(d[Collection.name], d[DataObject.name])
+            for d in _query_in_collection_tree(session.query(Collection.name, DataObject.name), collection_name))
 
 
 def collection_exists(session, collection):
     '''Returns a boolean value that indicates whether a collection with the provided name exists.'''
-    return len(list(session.query(Collection.name).filter(
-        Collection.name == collection).get_results())) > 0
+    return _has_results(session.query(Collection.name).filter(
+        Collection.name == collection))
+
+
+def has_subcollections(session, collection):
+    '''Returns a boolean value that indicates whether a collection has any subcollections.'''
+    return _has_results(session.query(Collection.name).filter(
+        Collection.parent_name == collection))
+
+
+def collection_is_empty(session, collection):
+    '''Returns a boolean value that indicates whether a collection is empty, i.e. it has no
+       subcollections, and the total size of its data objects is zero.'''
+    if has_subcollections(session, collection):
+        return False
+    # Without subcollections, only the data objects directly in the collection need to be
+    # checked, and the check can stop at the first data object that is not empty.
+    dataobjects = (session.query(DataObject.id, DataObject.size)
+                   .filter(Collection.name == collection)
+                   .get_results())
+    return not any(d[DataObject.size] not in (None, "") and int(d[DataObject.size]) > 0
+                   for d in dataobjects)
 
 
 def dataobject_exists(session, path):
     '''Returns a boolean value that indicates whether a data object with the provided name exists.'''
     collection_name, dataobject_name = os.path.split(path)
-    return len(list(session.query(Collection.name, DataObject.name).filter(
+    return _has_results(session.query(Collection.name, DataObject.name).filter(
         DataObject.name == dataobject_name).filter(
-        Collection.name == collection_name).get_results())) > 0
+        Collection.name == collection_name))
 
 
 def user_exists(session, username):
     '''Returns a boolean value that indicates whether a user with the provided name exists.'''
-    return len(list(session.query(User.name).filter(User.name == username).get_results())) > 0
+    return _has_results(session.query(User.name).filter(User.name == username))
 
 
 def group_exists(session, groupname):
     '''Returns a boolean value that indicates whether a user group with the provided name exists.'''
-    return (len(list(session.query(UserGroup.name).filter(
-        UserGroup.name == groupname).get_results())) > 0)
+    return _has_results(session.query(UserGroup.name).filter(
+        UserGroup.name == groupname))
+
+
+def _has_results(query):
+    '''Returns a boolean value that indicates whether a query has any results. The query is
+       limited to a single row, so that the server does not need to return any more.'''
+    return next(query.limit(1).get_results(), None) is not None
@@ -4,12 +4,12 @@
 import argparse
 import contextlib
 import os
-import re
 import sys
 
 from yclienttools import common_args, common_config
 from yclienttools import session as s
 from yclienttools.common_rules import RuleInterface
+from yclienttools.yoda_names import is_internal_user
 
 
 def _get_args():
@@ -57,9 +57,10 @@ def _get_format_help_text():
 
 def validate_data(rule_interface, args, userdata, groupdata):
     errors = []
+    internal_domains = frozenset(args.internal_domains.split(","))
 
     for user in userdata:
-        if not is_internal_user(user, args.internal_domains.split(",")):
+        if not is_internal_user(user, internal_domains):
             if not rule_interface.call_rule_user_exists(user):
                 errors.append("External user {} does not exist.".format(user))
 
@@ -70,15 +71,6 @@ def validate_data(rule_interface, args, userdata, groupdata):
     return errors
 
 
-def is_internal_user(username, internal_domains):
-    for domain in internal_domains:
-        domain_pattern = '@{}$'.format(domain)
-        if re.search(domain_pattern, username) is not None:
-            return True
-
-    return False
-
-
 def apply_data(rule_interface, args, userdata, groupdata, verbose, dry_run):
     for group in groupdata:
         apply_data_to_group(rule_interface, args, userdata, group, verbose, dry_run)
@@ -233,12 +225,10 @@ def _open_file_or_stdin(filename, mode):
 
 
 def parse_group_file(groupfile):
-    groups = []
-
     with _open_file_or_stdin(groupfile, "r") as input:
-        for line in input:
-            if line != "":
-                groups.append(line.rstrip())
+        # Blank lines are skipped, and duplicates are removed while keeping the original order.
+        groups = list(dict.fromkeys(line.strip() for line in input.read().splitlines()))
+        groups = [group for group in groups if group != ""]
 
     if len(groups) == 0:
         _exit_with_error("Group file has no groups.")
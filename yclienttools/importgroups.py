@@ -59,9 +59,19 @@ def parse_csv_file(input_file: str, args: argparse.Namespace, yoda_version: str)
             _exit_with_error(
                 "File has duplicate column(s): " + str(duplicate_columns))
 
+        lines = list(reader)
+
+        if not args.no_validate_domains:
+            predefined_labels = _get_csv_predefined_labels(yoda_version)
+            yoda_names.prefetch_domain_validation(
+                line[j].strip().lower()
+                for line in lines
+                for j in range(min(len(line), len(header)))
+                if header[j] not in predefined_labels)
+
         # Create a kind of MultiDict.
         # keys are the column names, items are the list of items
-        for line in reader:
+        for line in lines:
             row_number += 1
             d: dict = {}
             for j in range(len(line)):
@@ -204,12 +214,13 @@ def _are_roles_equivalent(a: str, b: str) -> bool:
 
 def validate_data(rule_interface: RuleInterface, args: argparse.Namespace, data: list) -> List[str]:
     errors = []
+    internal_domains = frozenset(args.internal_domains.split(","))
     for (category, subcategory, groupname, managers, members, viewers, schema_id, expiration_date) in data:
         if rule_interface.call_uuGroupExists(groupname) and not args.allow_update:
             errors.append('Group "{}" already exists'.format(groupname))
 
         for user in managers + members + viewers:
-            if not yoda_names.is_internal_user(user, args.internal_domains.split(",")):
+            if not yoda_names.is_internal_user(user, internal_domains):
                 # ensure that external users already have an iRODS account
                 # we do not want to be the actor that creates them (unless
                 # we are creating them in the name of a creator user)
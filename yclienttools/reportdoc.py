@@ -6,6 +6,7 @@ import sys
 from irods.models import Collection, DataObject
 from yclienttools import common_args, common_config, common_queries
 from yclienttools import session as s
+from yclienttools.common_csv import buffered_stdout
 
 
 def entry():
@@ -124,11 +125,12 @@ def _write_by_extension(session, output, collection_name):
 
 def report_collections(args, session):
     '''Print list of number of subcollections and data objects per collection'''
-    output = csv.writer(sys.stdout, delimiter=',')
-    for collection in common_queries.get_collections_in_root(
-            session, args.root):
-        collection_name = collection[Collection.name]
-        if args.by_extension:
-            _write_by_extension(session, output, collection_name)
-        else:
-            _write_regular(session, output, collection_name)
+    with buffered_stdout() as stdout:
+        output = csv.writer(stdout, delimiter=',')
+        for collection in common_queries.get_collections_in_root(
+                session, args.root):
+            collection_name = collection[Collection.name]
+            if args.by_extension:
+                _write_by_extension(session, output, collection_name)
+            else:
+                _write_regular(session, output, collection_name)
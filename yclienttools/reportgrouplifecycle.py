@@ -8,22 +8,101 @@
 '''
 
 import argparse
-import csv
 import datetime
 import itertools
+import json
+import os
 import sys
-from typing import Dict, List, Union
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple, Union
 
 import humanize
-from irods.column import Like
+from irods.column import In, Like
 from irods.message import (ET, XML_Parser_Type)
-from irods.models import Collection, DataObject, User
+from irods.models import Collection, DataObject, User, UserMeta
 from irods.session import iRODSSession
-from yclienttools import common_args, common_config, session as s
-from yclienttools.common_queries import collection_exists, get_collection_contents_last_modified, get_collection_size
+from yclienttools import common_args, common_config, exceptions, session as s
+from yclienttools.common_csv import buffered_stdout, format_csv_row
+from yclienttools.common_queries import get_collection_contents_last_modified, get_collection_size
 from yclienttools.options import GroupByOption
 
 
+class GroupCache:
+    '''This object stores metadata and has-data indicators of groups in a file in a local cache
+       directory. A cache entry is only used if the group still has the same creation time, and
+       if the entry has not expired.'''
+
+    CACHE_FILENAME = "groupcache.json"
+    ENTRY_KEYS = frozenset(["create_time", "cached_at", "attributes", "research_has_data", "vault_has_data"])
+
+    def __init__(self, dir: str, max_age: float):
+        """constructor
+
+           :param dir: local cache directory
+           :param max_age: maximum age of cache entries in seconds
+        """
+        self.filename = os.path.join(dir, self.CACHE_FILENAME)
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        '''Load unexpired entries from the on-disk cache file into the cache. A corrupt cache
+           file is ignored, since the cache only serves to speed up the report.'''
+        self.store = {}
+        if not os.path.isfile(self.filename):
+            return
+        now = time.time()
+        try:
+            with open(self.filename) as cache_file:
+                data = json.load(cache_file)
+            self.store = {group_name: entry for group_name, entry in data.items()
+                          if self.ENTRY_KEYS <= entry.keys() and now - entry["cached_at"] <= self.max_age}
+        except (json.JSONDecodeError, UnicodeDecodeError, AttributeError, KeyError, TypeError):
+            self.store = {}
+
+    def save(self):
+        '''Atomically replace the on-disk cache file with the contents of the cache.'''
+        # Use a unique temporary file, so that concurrent runs do not overwrite each other's file
+        with self.lock, tempfile.NamedTemporaryFile("w", dir=os.path.dirname(self.filename),
+                                                    prefix=self.CACHE_FILENAME + ".", suffix=".tmp",
+                                                    delete=False) as cache_file:
+            temp_filename = cache_file.name
+            try:
+                json.dump(self.store, cache_file)
+            except BaseException:
+                cache_file.close()
+                os.unlink(temp_filename)
+                raise
+        os.replace(temp_filename, self.filename)
+
+    def get(self, group_name: str, creation_date: Union[datetime.datetime, None]
+            ) -> Optional[Tuple[Dict[str, Union[str, List[str]]], bool, bool]]:
+        '''Fetch (attributes, research has data, vault has data) of a group from the cache,
+           or None if the cache has no valid entry for the group.'''
+        with self.lock:
+            entry = self.store.get(group_name)
+        if entry is None or entry["create_time"] != _timestamp_to_cache_key(creation_date):
+            return None
+        return entry["attributes"], entry["research_has_data"], entry["vault_has_data"]
+
+    def put(self, group_name: str, creation_date: Union[datetime.datetime, None],
+            attributes: Dict[str, Union[str, List[str]]], research_has_data: bool, vault_has_data: bool):
+        '''Put metadata and has-data indicators of a group in the cache.'''
+        with self.lock:
+            self.store[group_name] = {"create_time": _timestamp_to_cache_key(creation_date),
+                                      "cached_at": time.time(),
+                                      "attributes": attributes,
+                                      "research_has_data": research_has_data,
+                                      "vault_has_data": vault_has_data}
+
+
+def _timestamp_to_cache_key(value: Union[datetime.datetime, None]) -> Union[str, None]:
+    return None if value is None else value.isoformat()
+
+
 def entry():
     '''Entry point'''
     try:
@@ -50,42 +129,54 @@ def _get_args() -> argparse.Namespace:
                         help='Report sizes in human-readable figures (only relevant in combination with --size parameter)')
     parser.add_argument("-m", "--modified", default=False, action='store_true',
                         help='Include last modified date research/deposit collection, revisions and vault collection in output')
+    parser.add_argument("-w", "--workers", default=8, type=int,
+                        help='Number of groups to process in parallel, each using its own iRODS session (default: 8)')
+    parser.add_argument("-c", "--cache", default=None,
+                        help='Local cache directory. Can be used to retrieve previously collected group metadata and '
+                             + 'whether compartments have data, in order to speed up report generation. The script will '
+                             + 'also store newly collected group information in the cache.')
+    parser.add_argument("--cache-max-age", default=24, type=float,
+                        help='Maximum age of cache entries in hours (default: 24)')
     common_args.add_default_args(parser)
-    return parser.parse_args()
+    args = parser.parse_args()
+
+    if args.cache is not None and not os.path.isdir(args.cache):
+        print("Error: cache argument is not a valid directory.", file=sys.stderr)
+        sys.exit(1)
+
+    return args
 
 
-def _get_group_attributes(session: iRODSSession, group_name: str) -> Dict[str, Union[str, List[str]]]:
-    """Retrieves a dictionary of attribute-values of group metadata.
+def _get_group_attributes_bulk(session: iRODSSession) -> Dict[str, Dict[str, Union[str, List[str]]]]:
+    """Retrieves dictionaries of attribute-values of group metadata of all groups, using a single query.
 
        :param session: iRODS session
-       :param group_name: group name
 
-       :returns: dictionary of attribute-values. Values can be either strings, or lists of strings
-                 for multi-value attributes
+       :returns: dictionary with a dictionary of attribute-values for each group that has relevant
+                 metadata. Values can be either strings, or lists of strings for multi-value attributes
     """
     relevant_single_attributes = {"category", "subcategory", "expiration_date"}
     relevant_multiple_attributes = {"manager"}
-    result: Dict[str, Union[str, List[str]]] = dict()
-    group_objects = list(session.query(User).filter(
-        User.name == group_name).filter(
-        User.type == "rodsgroup").get_results())
-
-    if len(group_objects) > 0:
-        for attribute in relevant_multiple_attributes:
-            result[attribute] = []
-        for group_object in group_objects:
-            obj = session.users.get(group_object[User.name])
-            avus = obj.metadata.items()
-            for avu in avus:
-                if avu.name in relevant_single_attributes:
-                    result[avu.name] = avu.value
-                elif avu.name in relevant_multiple_attributes:
-                    result[avu.name].append(avu.value)  # type: ignore
+    result: Dict[str, Dict[str, Union[str, List[str]]]] = dict()
+    avus = session.query(User.name, UserMeta.name, UserMeta.value).filter(
+        User.type == "rodsgroup").filter(
+        In(UserMeta.name, list(relevant_single_attributes | relevant_multiple_attributes))).get_results()
+
+    for avu in avus:
+        attributes = result.setdefault(avu[User.name], _get_empty_group_attributes())
+        if avu[UserMeta.name] in relevant_single_attributes:
+            attributes[avu[UserMeta.name]] = avu[UserMeta.value]
+        else:
+            attributes[avu[UserMeta.name]].append(avu[UserMeta.value])  # type: ignore
 
     return result
 
 
-def _group_research_has_data(session: iRODSSession, group_name: str) -> int:
+def _get_empty_group_attributes() -> Dict[str, Union[str, List[str]]]:
+    return {"manager": []}
+
+
+def _group_research_has_data(session: iRODSSession, group_name: str) -> bool:
     """Returns boolean that indicates whether the research compartment of
        the group has any data (i.e. data objects or subcollections).
        if the group has no research department, None is returned.
@@ -93,12 +184,12 @@ def _group_research_has_data(session: iRODSSession, group_name: str) -> int:
        :param session: iRODS session
        :param group_name: group name
 
-       :returns: number of data objects in research group
+       :returns: whether research group has data
     """
     return _collection_has_data(session, _get_research_group_collection(session, group_name))
 
 
-def _group_vault_has_data(session: iRODSSession, group_name: str) -> int:
+def _group_vault_has_data(session: iRODSSession, group_name: str) -> bool:
     """Returns boolean that indicates whether the vault compartment of
        the group has any data (i.e. data objects or subcollections).
        If the group has no vault compartment, None is returned.
@@ -106,21 +197,17 @@ def _group_vault_has_data(session: iRODSSession, group_name: str) -> int:
        :param session: iRODS session
        :param group_name: group name
 
-       :returns: number of data objects in vault group
+       :returns: whether vault group has data
 
     """
     return _collection_has_data(session, _get_vault_group_collection(session, group_name))
 
 
 def _get_vault_group_collection(session: iRODSSession, group_name: str) -> str:
-    if group_name.startswith("research-"):
-        return f"/{session.zone}/home/{group_name}".replace(
-            "research-", "vault-", 1)
-    elif group_name.startswith("deposit-"):
-        return f"/{session.zone}/home/{group_name}".replace(
-            "deposit-", "vault-", 1)
-    else:
-        raise Exception("Unable to get vault group for group " + group_name)
+    for prefix in ("research-", "deposit-"):
+        if group_name.startswith(prefix):
+            return f"/{session.zone}/home/vault-{group_name[len(prefix):]}"
+    raise Exception("Unable to get vault group for group " + group_name)
 
 
 def _get_research_group_collection(session: iRODSSession, group_name: str) -> str:
@@ -131,66 +218,94 @@ def _get_revision_group_collection(session: iRODSSession, group_name: str) -> st
     return f"/{session.zone}/yoda/revisions/{group_name}"
 
 
-def _get_research_size(session: iRODSSession, group_name: str) -> Union[int, None]:
-    collection = _get_research_group_collection(session, group_name)
-    if collection_exists(session, collection):
-        return _get_collection_size_for_glr(session, collection)
-    else:
-        return None
+def _get_research_size(session: iRODSSession, group_name: str, has_data: bool,
+                       existing_collections: FrozenSet[str]) -> Union[int, None]:
+    return _get_group_collection_size(session, _get_research_group_collection(session, group_name),
+                                      has_data, existing_collections)
 
 
-def _get_vault_size(session: iRODSSession, group_name: str) -> Union[int, None]:
-    collection = _get_vault_group_collection(session, group_name)
-    if collection_exists(session, collection):
-        return _get_collection_size_for_glr(session, collection)
-    else:
-        return None
+def _get_vault_size(session: iRODSSession, group_name: str, has_data: bool,
+                    existing_collections: FrozenSet[str]) -> Union[int, None]:
+    return _get_group_collection_size(session, _get_vault_group_collection(session, group_name),
+                                      has_data, existing_collections)
 
 
-def _get_revisions_size(session: iRODSSession, group_name: str) -> Union[int, None]:
-    collection = _get_revision_group_collection(session, group_name)
-    if collection_exists(session, collection):
-        return _get_collection_size_for_glr(session, collection)
-    else:
+def _get_revisions_size(session: iRODSSession, group_name: str, existing_collections: FrozenSet[str]) -> Union[int, None]:
+    return _get_group_collection_size(session, _get_revision_group_collection(session, group_name),
+                                      True, existing_collections)
+
+
+def _get_group_collection_size(session: iRODSSession, collection: str, has_data: bool,
+                               existing_collections: FrozenSet[str]) -> Union[int, None]:
+    if collection not in existing_collections:
         return None
+    elif not has_data:
+        return 0
+    else:
+        return _get_collection_size_for_glr(session, collection)
 
 
-def _get_collection_size_for_glr(session: iRODSSession, collection_name: str) -> int:
-    return get_collection_size(session, collection_name, True, GroupByOption.none, False)['all']
+def _get_existing_group_collections(session: iRODSSession) -> FrozenSet[str]:
+    """Retrieves the names of all collections in the home collection and in the revisions
+       collection, so that the existence of group collections does not need to be checked
+       separately for each group.
 
+       :param session: iRODS session
 
-def _collection_has_data(session: iRODSSession, coll_name: str) -> int:
+       :returns: set of collection names
+    """
+    parent_collections = [f"/{session.zone}/home", f"/{session.zone}/yoda/revisions"]
+    collections = session.query(Collection.name).filter(
+        In(Collection.parent_name, parent_collections)).get_results()
+    return frozenset(c[Collection.name] for c in collections)
+
+
+def _get_collection_size_for_glr(session: iRODSSession, collection_name: str) -> Union[int, None]:
+    # get_collection_size checks whether the collection exists, so there
+    # is no need for a separate existence check.
+    try:
+        return get_collection_size(session, collection_name, True, GroupByOption.none, False)['all']
+    except exceptions.NotFoundException:
+        return None
+
+
+def _collection_has_data(session: iRODSSession, coll_name: str) -> bool:
+    # Query results are generated lazily, so queries after the first one that
+    # returns a result are not executed.
     root_data_objects = session.query(Collection.name, DataObject.name).filter(
         Collection.name == coll_name).get_results()
     sub_data_objects = session.query(Collection.name, DataObject.name).filter(
         Like(Collection.name, coll_name + "/%")).get_results()
     sub_data_collections = session.query(Collection.name).filter(
         Like(Collection.name, coll_name + "/%")).get_results()
-    return len(list(itertools.chain(root_data_objects,
-                                    sub_data_objects,
-                                    sub_data_collections)))
+    return any(itertools.chain(root_data_objects,
+                               sub_data_objects,
+                               sub_data_collections))
 
 
-def _get_group_creation_date(session: iRODSSession, group_name: str) -> Union[datetime.datetime, None]:
-    create_times = list(session.query(
-        User.create_time).filter(
-        User.name == group_name).get_results())
-    return create_times[0][User.create_time] if len(create_times) else None
+def _get_relevant_groups_list(session: iRODSSession) -> List[Tuple[str, datetime.datetime]]:
+    """Returns research and deposit groups, along with their creation date.
 
+       :param session: iRODS session
 
-def _get_relevant_groups_list(session: iRODSSession) -> List[str]:
-    groups = session.query(User).filter(User.type == 'rodsgroup').get_results()
-    return [x[User.name]
-            for x in groups if x[User.name].startswith(("research-", "deposit-"))]
+       :returns: list of (group name, creation date) tuples
+    """
+    groups = itertools.chain.from_iterable(
+        session.query(User.name, User.create_time).filter(
+            User.type == 'rodsgroup').filter(
+            Like(User.name, prefix + "%")).get_results()
+        for prefix in ("research-", "deposit-"))
+    return [(x[User.name], x[User.create_time]) for x in groups]
 
 
 def _get_regular_members(session: iRODSSession, group_name: str, attributes: Dict[str, Union[str, List[str]]]) -> List[str]:
     members_and_managers = session.user_groups.getmembers(group_name)
+    managers = frozenset(attributes["manager"])
     return [
-        member.name for member in members_and_managers if member.name + "#" + session.zone not in attributes["manager"]]
+        member.name for member in members_and_managers if member.name + "#" + session.zone not in managers]
 
 
-def _get_readonly_members(session: iRODSSession, group_name: str, attributes: Dict[str, Union[str, List[str]]]) -> List[str]:
+def _get_readonly_members(session: iRODSSession, group_name: str) -> List[str]:
     readonly_group = group_name.replace("research-", "read-", 1)
     return [u.name for u in session.user_groups.getmembers(readonly_group)]
 
@@ -226,59 +341,159 @@ def _list_or_str_to_str(value: Union[str, List[str]]) -> str:
         return ";".join(value)
 
 
-def _size_to_str(value: Union[int, None], human_readable: bool) -> str:
-    if value is None:
-        return "N/A"
-    elif human_readable:
-        return humanize.naturalsize(value, binary=True)
+def _get_size_formatter(human_readable: bool) -> Callable[[Union[int, None]], str]:
+    """Returns a function that converts a size to a string for the report, so that the
+       output format only needs to be determined once.
+
+       :param human_readable: whether to return sizes in human-readable format
+
+       :returns: function that converts a size (or None if unavailable) to a string
+    """
+    if human_readable:
+        def _size_to_str(value: Union[int, None]) -> str:
+            return "N/A" if value is None else humanize.naturalsize(value, binary=True)
     else:
-        return str(value)
+        def _size_to_str(value: Union[int, None]) -> str:
+            return "N/A" if value is None else str(value)
+    return _size_to_str
 
 
 def _timestamp_to_date_str(value: Union[datetime.datetime, None]) -> str:
     return "N/A" if value is None else value.strftime("%Y-%m-%d")
 
 
+def _has_data_to_string(value: Union[bool, None]) -> str:
+    if value is None:
+        return "N/A"
+    else:
+        return "yes" if value else "no"
+
+
+def _collect_group_row(session: iRODSSession, args: argparse.Namespace, group: str,
+                       creation_date: Union[datetime.datetime, None],
+                       group_attributes: Optional[Dict[str, Union[str, List[str]]]], cache: Optional[GroupCache],
+                       size_to_str: Callable[[Union[int, None]], str], existing_collections: FrozenSet[str]) -> List[str]:
+    """Retrieves the report data of a single group.
+
+       :param session: iRODS session
+       :param args: parsed command line arguments
+       :param group: group name
+       :param creation_date: creation date of the group
+       :param group_attributes: dictionary of attribute-values of the group metadata, or None if
+                                group metadata has not been retrieved (only if the group is cached)
+       :param cache: group cache (None if no cache is used)
+       :param size_to_str: function that converts sizes to strings
+       :param existing_collections: names of existing group collections
+
+       :returns: list of column values for the group
+    """
+    cache_entry = cache.get(group, creation_date) if cache is not None else None
+    if cache_entry is None:
+        # Group metadata is always retrieved if there are groups that are not cached.
+        assert group_attributes is not None
+        attributes = group_attributes
+        # Whether the compartments have data is determined once, so that the size of
+        # empty compartments does not need to be computed.
+        research_has_data = _group_research_has_data(session, group)
+        # The vault compartment can only have data if its collection exists. Groups without
+        # a vault collection (e.g. groups that have never published any data) are common,
+        # so this saves the has-data queries for these groups.
+        vault_has_data = (_get_vault_group_collection(session, group) in existing_collections
+                          and _group_vault_has_data(session, group))
+        has_data_is_current = True
+        if cache is not None:
+            cache.put(group, creation_date, attributes, research_has_data, vault_has_data)
+    else:
+        cached_attributes, research_has_data, vault_has_data = cache_entry
+        # Freshly retrieved metadata takes precedence over cached metadata.
+        attributes = cached_attributes if group_attributes is None else group_attributes
+        # Cached has-data indicators may be outdated, so they cannot be used to skip
+        # the size computation.
+        has_data_is_current = False
+
+    category = attributes.get("category", "no category")
+    subcategory = attributes.get("subcategory", "no subcategory")
+    group_managers = _list_or_str_to_str(_get_group_managers(session, group, attributes))
+    regular_members = _list_or_str_to_str(_get_regular_members(session, group, attributes))
+    readonly_members = _list_or_str_to_str(_get_readonly_members(session, group))
+    creation_date_str = creation_date.strftime(
+        "%Y-%m-%d") if creation_date is not None else "N/A"
+    expiration_date = attributes.get("expiration_date", "N/A")
+    rowdata = [group, category, subcategory,
+               group_managers, regular_members, readonly_members,
+               creation_date_str, expiration_date,
+               _has_data_to_string(research_has_data), _has_data_to_string(vault_has_data)]
+
+    if args.size:
+        rowdata.append(size_to_str(_get_research_size(
+            session, group, research_has_data or not has_data_is_current, existing_collections)))
+        rowdata.append(size_to_str(_get_vault_size(
+            session, group, vault_has_data or not has_data_is_current, existing_collections)))
+        rowdata.append(size_to_str(_get_revisions_size(session, group, existing_collections)))
+
+    if args.modified:
+        rowdata.append(_timestamp_to_date_str(
+            get_collection_contents_last_modified(session, _get_research_group_collection(session, group))))
+        rowdata.append(_timestamp_to_date_str(
+            get_collection_contents_last_modified(session, _get_vault_group_collection(session, group))))
+        rowdata.append(_timestamp_to_date_str(
+            get_collection_contents_last_modified(session, _get_revision_group_collection(session, group))))
+
+    return rowdata
+
+
+def _get_group_rows(args: argparse.Namespace, session: iRODSSession,
+                    groups: List[Tuple[str, datetime.datetime]], cache: Optional[GroupCache]) -> Iterator[List[str]]:
+    """Yields the report rows of a list of groups, in the order of the list.
+
+       :param args: parsed command line arguments
+       :param session: iRODS session
+       :param groups: list of (group name, creation date) tuples
+       :param cache: group cache (None if no cache is used)
+
+       :returns: generator of lists of column values
+    """
+    # Group metadata only needs to be retrieved if it is not available in the cache
+    # for at least one group.
+    has_uncached_groups = cache is None or any(cache.get(group, creation_date) is None
+                                               for group, creation_date in groups)
+    attributes = _get_group_attributes_bulk(session) if has_uncached_groups else None
+
+    def _get_group_attributes(group: str) -> Optional[Dict[str, Union[str, List[str]]]]:
+        return None if attributes is None else attributes.get(group, _get_empty_group_attributes())
+
+    size_to_str = _get_size_formatter(args.human_readable)
+    # Existing collections are needed for sizes, and for determining whether the vault
+    # compartments of groups that are not in the cache have data.
+    existing_collections = (_get_existing_group_collections(session) if args.size or has_uncached_groups
+                            else frozenset())
+
+    if args.workers <= 1:
+        for group, creation_date in groups:
+            yield _collect_group_row(session, args, group, creation_date, _get_group_attributes(group), cache,
+                                     size_to_str, existing_collections)
+        return
+
+    def _collect_group_row_in_worker(worker_session: iRODSSession,
+                                     group: Tuple[str, Union[datetime.datetime, None]]) -> List[str]:
+        group_name, creation_date = group
+        return _collect_group_row(worker_session, args, group_name, creation_date,
+                                  _get_group_attributes(group_name), cache, size_to_str, existing_collections)
+
+    # Rows are yielded as soon as they and all preceding rows are available, so that
+    # completed rows do not have to be kept in memory until all groups are processed.
+    yield from s.map_with_worker_sessions(_collect_group_row_in_worker, groups, args.workers,
+                                          args.yoda_version, args.quasi_xml)
+
+
 def report_groups_lifecycle(args: argparse.Namespace, session: iRODSSession):
-    output = csv.writer(sys.stdout, delimiter=',')
-    output.writerow(_get_columns(args))
+    cache = GroupCache(args.cache, args.cache_max_age * 3600) if args.cache else None
 
-    def _has_data_to_string(value):
-        if value is None:
-            return "N/A"
-        else:
-            return "yes" if value else "no"
-
-    for group in sorted(_get_relevant_groups_list(session)):
-        attributes = _get_group_attributes(session, group)
-        category = attributes.get("category", "no category")
-        subcategory = attributes.get("subcategory", "no subcategory")
-        group_managers = _list_or_str_to_str(_get_group_managers(session, group, attributes))
-        regular_members = _list_or_str_to_str(_get_regular_members(session, group, attributes))
-        readonly_members = _list_or_str_to_str(_get_readonly_members(session, group, attributes))
-        creation_date = _get_group_creation_date(session, group)
-        creation_date_str = creation_date.strftime(
-            "%Y-%m-%d") if creation_date is not None else "N/A"
-        expiration_date = attributes.get("expiration_date", "N/A")
-        research_has_data = _has_data_to_string(
-            _group_research_has_data(session, group))
-        vault_has_data = _has_data_to_string(
-            _group_vault_has_data(session, group))
-        rowdata = [group, category, subcategory,
-                   group_managers, regular_members, readonly_members,
-                   creation_date_str, expiration_date, research_has_data, vault_has_data]
-
-        if args.size:
-            rowdata.append(_size_to_str(_get_research_size(session, group), args.human_readable))
-            rowdata.append(_size_to_str(_get_vault_size(session, group), args.human_readable))
-            rowdata.append(_size_to_str(_get_revisions_size(session, group), args.human_readable))
-
-        if args.modified:
-            rowdata.append(_timestamp_to_date_str(
-                get_collection_contents_last_modified(session, _get_research_group_collection(session, group))))
-            rowdata.append(_timestamp_to_date_str(
-                get_collection_contents_last_modified(session, _get_vault_group_collection(session, group))))
-            rowdata.append(_timestamp_to_date_str(
-                get_collection_contents_last_modified(session, _get_revision_group_collection(session, group))))
-
-        output.writerow(rowdata)
+    with buffered_stdout() as output:
+        output.write(format_csv_row(_get_columns(args)))
+        groups = sorted(_get_relevant_groups_list(session))
+        for rowdata in _get_group_rows(args, session, groups, cache):
+            output.write(format_csv_row(rowdata))
+
+    if cache is not None:
+        cache.save()
@@ -7,47 +7,132 @@ import humanize
 import os
 import sys
 from time import time
-from collections import OrderedDict, defaultdict
-from irods.models import Collection
+from collections import Counter, OrderedDict, defaultdict
+from itertools import chain
+from irods.column import Like
+from irods.models import Collection, CollectionMeta
 from yclienttools import common_args, common_config, common_queries
 from yclienttools.options import GroupByOption
-from yclienttools.session import setup_session
+from yclienttools.session import map_with_worker_sessions, setup_session
 
 
 class DatasetStatisticsCache:
-    '''This object stores statistics of a dataset in files in a local cache directory.'''
+    '''This object stores statistics of a dataset in a file in a local cache directory.
+       Statistics are stored as (number of data objects, total size) tuples.'''
+
+    CACHE_FILENAME = "dsscache.dat"
 
     def __init__(self, dir):
         self.dir = dir
+        self.filename = os.path.join(dir, self.CACHE_FILENAME)
         self.memstore = {}
         self.load()
 
     def load(self):
-        '''Load statistics from the on-disk cache directory into the cache.'''
+        '''Load statistics from the on-disk cache directory into the cache. Cache files
+           in the legacy format (one file per run) are merged into the cache file if the
+           cache directory is writable.'''
         self.filestore = {}
-        for filename in glob(os.path.join(self.dir, "dsscache.*.dat")):
-            with open(filename) as cache_file:
-                for line in csv.reader(cache_file):
-                    data = {"num": int(line[1]), "size": int(line[2])}
-                    self.filestore[line[0]] = data
+        self.rewrite_on_save = False
+        legacy_filenames = sorted(glob(os.path.join(self.dir, "dsscache.*.dat")))
+
+        for filename in [self.filename] + legacy_filenames:
+            if not os.path.isfile(filename):
+                continue
+            with open(filename, newline="") as cache_file:
+                well_formed = self._load_file(cache_file)
+            if filename == self.filename and not well_formed:
+                # Rows appended to a malformed file could end up in a malformed row themselves
+                self.rewrite_on_save = True
+
+        if len(legacy_filenames) > 0 and os.access(self.dir, os.W_OK):
+            self._merge_legacy_files(legacy_filenames)
+
+    def _merge_legacy_files(self, legacy_filenames):
+        '''Replace legacy cache files by the merged cache file. This is only housekeeping, so
+           failures are reported, but not fatal: the legacy files are then loaded again next time.'''
+        try:
+            self._write_merged_file()
+            for filename in legacy_filenames:
+                try:
+                    os.unlink(filename)
+                except FileNotFoundError:
+                    # Already merged by a concurrent run
+                    pass
+        except OSError as e:
+            print("Warning: could not merge legacy dataset statistics cache files: {}".format(e),
+                  file=sys.stderr)
+
+    def _load_file(self, cache_file):
+        '''Load the entries of a cache file into the file store. Malformed entries, e.g. an entry
+           that was only partly written because a previous run was interrupted, are skipped.
+           Returns whether all entries could be loaded.'''
+        well_formed = True
+        try:
+            for row in csv.reader(cache_file):
+                try:
+                    path, num, size = row
+                    self.filestore[path] = (int(num), int(size))
+                except ValueError:
+                    well_formed = False
+        except csv.Error:
+            # Remainder of the file cannot be parsed (e.g. a truncated quoted path)
+            well_formed = False
+        return well_formed
+
+    def _ends_with_newline(self):
+        '''Returns whether the cache file is empty, missing or ends with a newline, so that
+           entries can be appended to it.'''
+        try:
+            with open(self.filename, "rb") as cache_file:
+                if cache_file.seek(0, os.SEEK_END) == 0:
+                    return True
+                cache_file.seek(-1, os.SEEK_END)
+                return cache_file.read(1) == b"\n"
+        except FileNotFoundError:
+            return True
+
+    def _format_line(self, path, num, size):
+        '''Format a line of a cache file. The path is only quoted if needed.'''
+        if any(c in path for c in ',"\r\n'):
+            path = '"{}"'.format(path.replace('"', '""'))
+        return "{},{},{}\n".format(path, num, size)
+
+    def _write_merged_file(self):
+        '''Atomically replace the cache file with the contents of the file store.'''
+        temp_filename = self.filename + ".tmp"
+        with open(temp_filename, "w", buffering=1 << 20, newline="") as cache_file:
+            for path, (num, size) in self.filestore.items():
+                cache_file.write(self._format_line(path, num, size))
+        os.replace(temp_filename, self.filename)
 
     def save(self):
-        '''Store statistics that have been added to the cache using the put function on disk in the cache directory.'''
+        '''Store statistics that have been added to the cache using the put function on disk in the cache directory.
+           New statistics are appended to the cache file, unless the cache file is malformed. In that
+           case it is replaced by a file with all statistics.'''
         if len(self.memstore.keys()) == 0:
             return
 
-        filename = os.path.join(self.dir, "dsscache.{}.dat".format(time()))
+        if self.rewrite_on_save:
+            self.filestore.update(self.memstore)
+            self._write_merged_file()
+            self.rewrite_on_save = False
+            self.memstore = {}
+            return
 
-        with open(filename, "w") as cache_file:
-            writer = csv.writer(cache_file)
-            for path, data in self.memstore.items():
-                writer.writerow([path, str(data["num"]), str(data["size"])])
-                self.filestore[path] = data
+        ends_with_newline = self._ends_with_newline()
+        with open(self.filename, "a", buffering=1 << 20, newline="") as cache_file:
+            if not ends_with_newline:
+                # Terminate an entry that was only partly written by an interrupted run
+                cache_file.write("\n")
+            for path, (num, size) in self.memstore.items():
+                cache_file.write(self._format_line(path, num, size))
+                self.filestore[path] = (num, size)
 
         self.memstore = {}
 
     def get(self, pathname):
-        '''Fetch statistics of a dataset from cache.'''
+        '''Fetch statistics of a dataset from cache, as a (number of data objects, total size) tuple.'''
         if pathname in self.filestore:
             return self.filestore[pathname]
         elif pathname in self.memstore:
@@ -61,7 +146,7 @@ class DatasetStatisticsCache:
 
     def put(self, pathname, num_objects, total_size):
         '''Put statistics of a dataset in the cache.'''
-        self.memstore[pathname] = {"num": num_objects, "size": total_size}
+        self.memstore[pathname] = (num_objects, total_size)
 
 
 def _get_args():
@@ -74,6 +159,8 @@ def _get_args():
                         help='Study to process')
     parser.add_argument('-c', '--cache', default=None,
                         help='Local cache directory. Can be used to retrieve previously collected information on datasets, in order to speed up report generation. The script will also store newly collected dataset information in the cache.')
+    parser.add_argument('-w', '--workers', default=8, type=int,
+                        help='Number of datasets to collect statistics of in parallel, each using its own iRODS session (default: 8)')
 
     args = parser.parse_args()
 
@@ -120,7 +207,7 @@ def main():
     vault_dataset_count = _get_vault_dataset_count(
         session, datasets, vault_collection, args.progress)
     aggregated_dataset_info = _get_aggregated_dataset_info(
-        session, datasets, vault_collection, args.progress, cache)
+        session, datasets, vault_collection, args.progress, cache, args.workers, yoda_version)
 
     for category in ["raw", "processed"]:
         _print_vault_dataset_count(vault_dataset_count, category)
@@ -140,24 +227,29 @@ def _get_datasets_with_metadata(session, root):
        dictionary are names of subcollections. The inner dictionaries contains the intake module metadata of each subcollection, with
        the metadata field names in the keys. Only subcollections that have at least one intake module metadata field are present in the output.'''
     datasets = defaultdict(lambda: defaultdict(dict))
-
-    for collection in common_queries.get_collections_in_root(session, root):
-        collection_name = collection[Collection.name]
-        metadata_collection = session.collections.get(collection_name).metadata
-        for metadata in metadata_collection.items():
-            if metadata.name in ["version", "experiment_type"]:
-                metadata.value = metadata.value.lower()
-            if metadata.name in ["dataset_date_created", "wave",
-                                 "version", "experiment_type", "pseudocode"]:
-                datasets[collection_name][metadata.name] = metadata.value
+    relevant_attributes = {"dataset_date_created", "wave", "version", "experiment_type", "pseudocode"}
+    lowercase_attributes = {"version", "experiment_type"}
+
+    root_metadata = (session.query(Collection.name, CollectionMeta.name, CollectionMeta.value)
+                     .filter(Collection.name == root)
+                     .get_results())
+    subcollection_metadata = (session.query(Collection.name, CollectionMeta.name, CollectionMeta.value)
+                              .filter(Like(Collection.name, root + "/%"))
+                              .get_results())
+
+    for row in chain(root_metadata, subcollection_metadata):
+        name = row[CollectionMeta.name]
+        if name in relevant_attributes:
+            value = row[CollectionMeta.value]
+            datasets[row[Collection.name]][name] = value.lower() if name in lowercase_attributes else value
 
     return datasets
 
 
 def _get_vault_dataset_count(session, datasets, intakecollection, progress):
-    '''Returns a nested dictionary with counts of datasets per experiment type, wave and version in an intake
-       folder.'''
-    counts = defaultdict(lambda: defaultdict(dict))
+    '''Returns a dictionary with a counter for each category (raw and processed), with counts of datasets
+       per (experiment type, wave, version) in an intake folder.'''
+    counts = {"raw": Counter(), "processed": Counter()}
 
     if progress:
         _print_progress_update(
@@ -165,13 +257,9 @@ def _get_vault_dataset_count(session, datasets, intakecollection, progress):
 
     for collection, metadata in datasets:
         if "dataset_date_created" in metadata:
-            et = metadata['experiment_type']
-            wave = metadata['wave']
             version = metadata['version']
-            if version in counts[et][wave]:
-                counts[et][wave][version] += 1
-            else:
-                counts[et][wave][version] = 1
+            category = "raw" if version == "raw" else "processed"
+            counts[category][(metadata['experiment_type'], metadata['wave'], version)] += 1
 
     if progress:
         _print_progress_update("Counting datasets in vault finished.")
@@ -179,8 +267,34 @@ def _get_vault_dataset_count(session, datasets, intakecollection, progress):
     return counts
 
 
+def _get_dataset_statistics(session, collection):
+    '''Returns a (number of data objects, total size) tuple of a dataset.'''
+    file_count = common_queries.get_dataobject_count(session, collection)
+    filesize_dict = common_queries.get_collection_size(
+        session, collection, False, GroupByOption.none, False)
+    return file_count, filesize_dict["all"]
+
+
+def _get_datasets_statistics(session, collections, progress, workers, yoda_version):
+    '''Returns a dictionary with (number of data objects, total size) tuples of a list of datasets.
+       If more than one worker is used, statistics are collected in parallel, with a separate
+       iRODS session for each worker thread.'''
+
+    def _get_statistics(thread_session, collection):
+        if progress:
+            _print_progress_update(
+                "Calculating statistics for collection {} ...".format(collection))
+        return _get_dataset_statistics(thread_session, collection)
+
+    if workers <= 1:
+        return {collection: _get_statistics(session, collection) for collection in collections}
+
+    statistics = map_with_worker_sessions(_get_statistics, collections, workers, yoda_version)
+    return dict(zip(collections, statistics))
+
+
 def _get_aggregated_dataset_info(
-        session, datasets, intakecollection, progress, cache):
+        session, datasets, intakecollection, progress, cache, workers, yoda_version):
     '''Returns a nested dictionary with three dictionaries containing aggregated data of all raw datasets, all processed
        datasets, as well as of overall (total) statistics.'''
 
@@ -193,15 +307,21 @@ def _get_aggregated_dataset_info(
         for variable in ["dataset_count", "dataset_growth",
                          "file_count", "total_filesize", "filesize_growth"]:
             results[category][variable] = 0
+        results[category]["pseudocodes"] = set()
 
     ref_lastmonth = time() - 30 * 24 * 3600
 
-    for collection, metadata in datasets:
-        if "dataset_date_created" not in metadata:
-            # Collection is only considered a dataset if it has the
-            # dataset_date_created field
-            continue
+    # Collection is only considered a dataset if it has the
+    # dataset_date_created field
+    datasets = [(collection, metadata) for collection, metadata in datasets
+                if "dataset_date_created" in metadata]
 
+    uncached_collections = [collection for collection, _ in datasets
+                            if cache is None or not cache.has(collection)]
+    computed_statistics = _get_datasets_statistics(
+        session, uncached_collections, progress, workers, yoda_version)
+
+    for collection, metadata in datasets:
         if metadata["version"] == "raw":
             category = "raw"
         else:
@@ -209,43 +329,30 @@ def _get_aggregated_dataset_info(
 
         results[category]["dataset_count"] += 1
 
-        if cache is not None and cache.has(collection):
-
-            cache_entry = cache.get(collection)
-            file_count = cache_entry["num"]
-            total_filesize = cache_entry["size"]
+        if collection in computed_statistics:
+            file_count, total_filesize = computed_statistics[collection]
 
-            if progress:
-                _print_progress_update(
-                    "Retrieved statistics of collection {} from cache.".format(collection))
+            if cache is not None:
+                cache.put(collection, file_count, total_filesize)
         else:
+            file_count, total_filesize = cache.get(collection)
 
             if progress:
                 _print_progress_update(
-                    "Calculating statistics for collection {} ...".format(collection))
-
-            file_count = common_queries.get_dataobject_count(
-                session, collection)
-            filesize_dict = common_queries.get_collection_size(
-                session, collection, False, GroupByOption.none, False)
-            total_filesize = filesize_dict["all"]
-
-            if cache is not None:
-                cache.put(collection, file_count, total_filesize)
+                    "Retrieved statistics of collection {} from cache.".format(collection))
 
         results[category]["file_count"] += file_count
         results[category]["total_filesize"] += total_filesize
 
         pseudocode = metadata["pseudocode"]
-        results[category]["pseudocodes"][pseudocode] = True
+        results[category]["pseudocodes"].add(pseudocode)
 
         if int(metadata["dataset_date_created"]) > ref_lastmonth:
             results[category]["dataset_growth"] += 1
             results[category]["filesize_growth"] += total_filesize
 
     for category, stats in results.items():
-        stats['pseudocode_count'] = len(stats["pseudocodes"].keys())
-        stats.pop("pseudocodes")
+        stats['pseudocode_count'] = len(stats.pop("pseudocodes", set()))
 
     for variable, value in results['raw'].items():
         results["total"][variable] = results["raw"][variable] + \
@@ -283,27 +390,15 @@ def _print_vault_dataset_count(vault_dataset_count, category):
                 "Count"))
         print("-" * 60)
 
-    for et in sorted(vault_dataset_count.keys()):
-        et_data = vault_dataset_count[et]
-        for wave in sorted(et_data.keys()):
-            wave_data = et_data[wave]
-            for version in sorted(wave_data.keys()):
-                count = wave_data[version]
-                if category == "raw" and version == "raw":
-                    print("{:20}{:10}{:10}".format(et, wave, count))
-                elif category == "raw":
-                    pass
-                elif category == "processed" and version != "raw":
-                    print(
-                        "{:20}{:20}{:10}{:10}".format(
-                            et, version, wave, count))
-                elif category == "processed":
-                    pass
-                else:
-                    print(
-                        "Warning: unexpected category / version combination {} / {}".format(
-                            category, version), file=sys.stderr)
-                    sys.exit(1)
+    category_counts = sorted(vault_dataset_count[category].items())
+    if category == "raw":
+        for (et, wave, version), count in category_counts:
+            print("{:20}{:10}{:10}".format(et, wave, count))
+    else:
+        for (et, wave, version), count in category_counts:
+            print(
+                "{:20}{:20}{:10}{:10}".format(
+                    et, version, wave, count))
 
 
 def _print_aggregated_dataset_info(dataset_info, category):
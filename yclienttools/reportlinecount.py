@@ -6,6 +6,8 @@ import sys
 from yclienttools import common_args, common_config, common_queries
 from yclienttools import session as s
 
+READ_BUFFER_SIZE = 1 << 20
+
 
 def entry():
     '''Entry point'''
@@ -21,7 +23,7 @@ def entry():
                       file=sys.stderr)
                 sys.exit(1)
 
-            print_objectsincollection(session, output, args.collection)
+            print_objectsincollection(session, output, args.collection, args.workers, yoda_version)
 
         elif args.data_object:
             if not common_queries.dataobject_exists(session, args.data_object):
@@ -46,17 +48,45 @@ def _get_args():
                                   help='show line counts of all data objects in this collection (recursive)')
     fileorcollection.add_argument("-d", "--data-object", default=None,
                                   help='show line count of only this data object')
+    parser.add_argument('-w', '--workers', default=8, type=int,
+                        help='number of data objects to count lines of in parallel, each using its own iRODS session (default: 8)')
     return parser.parse_args()
 
 
 def print_singleobject(session, output, data_object):
     '''Print line count of single data object'''
-    fd = session.data_objects.get(data_object).open()
-    linecount = sum([1 for line in fd])
-    output.writerow([data_object, str(linecount)])
+    output.writerow([data_object, str(count_lines(session, data_object))])
+
+
+def count_lines(session, data_object):
+    '''Returns the number of lines in a data object. A last line without line terminator
+       is counted as well.'''
+    linecount = 0
+    last_chunk = b""
+    with session.data_objects.get(data_object).open("r") as fd:
+        for chunk in iter(lambda: fd.read(READ_BUFFER_SIZE), b""):
+            linecount += chunk.count(b"\n")
+            last_chunk = chunk
+    if last_chunk and not last_chunk.endswith(b"\n"):
+        linecount += 1
+    return linecount
+
+
+def print_objectsincollection(session, output, collection, workers=1, yoda_version=None):
+    '''Print line count of all data objects in a collection (as well as its subcollections).
+       If more than one worker is used, data objects are read in parallel, with a separate
+       iRODS session for each worker thread.'''
+    dataobjects = common_queries.get_dataobjects_in_collection(session, collection)
+
+    if workers <= 1:
+        for dataobject in dataobjects:
+            print_singleobject(session, output, dataobject)
+        return
 
+    def _count_lines_in_worker(worker_session, dataobject):
+        return dataobject, count_lines(worker_session, dataobject)
 
-def print_objectsincollection(session, output, collection):
-    '''Print line count of all data objects in a collection (as well as its subcollections)'''
-    for dataobject in common_queries.get_dataobjects_in_collection(session, collection):
-        print_singleobject(session, output, dataobject)
+    # Results are returned in the same order as the data objects,
+    # so output order does not depend on the number of workers.
+    for dataobject, linecount in s.map_with_worker_sessions(_count_lines_in_worker, dataobjects, workers, yoda_version):
+        output.writerow([dataobject, str(linecount)])
@@ -2,14 +2,22 @@
 
 import argparse
 import humanize
-import csv
 import sys
+from collections import defaultdict, namedtuple
 from irods.message import (XML_Parser_Type, ET)
 from irods.models import Collection, User, UserMeta
 from yclienttools import session as s, common_args, common_config, exceptions
-from yclienttools.common_queries import collection_exists, get_collection_size
+from yclienttools.common_csv import buffered_stdout, format_csv_row
+from yclienttools.common_queries import get_collection_size, get_revision_collections
 from yclienttools.options import GroupByOption
 
+# Number of collections after which buffered output is flushed, so that a consumer of the
+# report can start processing rows before the report is complete.
+FLUSH_INTERVAL = 256
+
+# Report options, as determined from the command line arguments
+ReportOpts = namedtuple('ReportOpts', 'human_readable count_all_replicas group_by include_revisions')
+
 
 def entry():
     '''Entry point'''
@@ -53,6 +61,9 @@ def _get_args():
                              + "'resource' or 'location'. Grouping by resource or location implies --count-all-replicas. "
                              + "If a collection has no dataobjects and --group-by resource / location is enabled, its size "
                              + "will be printed with group 'all'.")
+    parser.add_argument("-w", "--workers", default=8, type=int,
+                        help="Number of collections to compute the size of in parallel, each using its own iRODS session "
+                             + "(default: 8)")
     subject_group = parser.add_mutually_exclusive_group(required=True)
     subject_group.add_argument("-c", "--collection",
                                help='Show total size of data objects in this collection and its subcollections')
@@ -75,74 +86,102 @@ def _get_args():
     return args
 
 
-def _print_entry(csv_output, collection, group,
-                 raw_size, group_by, human_readable):
-    '''Prints an entry of the collection size report.'''
-
+def _get_size_formatter(human_readable):
+    '''Returns a function that converts a raw size to the size to display.'''
     if human_readable:
-        display_size = str(humanize.naturalsize(raw_size))
+        return lambda raw_size: str(humanize.naturalsize(raw_size))
     else:
-        display_size = str(raw_size)
+        return str
+
+
+def _print_entry(output, collection, group,
+                 display_size, group_by):
+    '''Prints an entry of the collection size report.'''
 
     if group_by == GroupByOption.none:
-        csv_output.writerow([collection, display_size])
+        output.write(format_csv_row([collection, display_size]))
     else:
-        csv_output.writerow([collection, group, display_size])
+        output.write(format_csv_row([collection, group, display_size]))
 
 
-def _report_size_collections(
-        session, human_readable, count_all_replicas, group_by, include_revisions, collections):
-    '''Prints a list of collections, along with the total size of their data objects,
-       including any data objects in subcollections.'''
-    output = csv.writer(sys.stdout, delimiter=',')
-    totals = {}
-    for collection in collections:
+def _get_collection_sizes(session, opts, collections, workers, yoda_version, quasi_xml, revision_collections):
+    '''Generates (collection, size result) tuples for an iterable of collections, in the same order.
+       If more than one worker is used, sizes are computed in parallel, with a separate iRODS session
+       for each worker thread.'''
+
+    def _get_size(worker_session, collection):
+        return get_collection_size(
+            worker_session, collection, opts.count_all_replicas, opts.group_by, opts.include_revisions,
+            revision_collections)
+
+    def _get_size_or_none(worker_session, collection):
         try:
+            return collection, _get_size(worker_session, collection)
+        except exceptions.NotFoundException:
+            return collection, None
 
-            size_result = get_collection_size(
-                session, collection, count_all_replicas, group_by, include_revisions,)
+    if workers <= 1:
+        results = (_get_size_or_none(session, collection) for collection in collections)
+    else:
+        results = s.map_with_worker_sessions(_get_size_or_none, collections, workers, yoda_version, quasi_xml)
+
+    for collection, size_result in results:
+        if size_result is None:
+            # Stops any remaining work in the worker threads before exiting.
+            results.close()
+            exit_with_error(session, "Error: collection {} not found (or access denied).".format(
+                collection))
+        yield collection, size_result
+
+
+def _report_size_collections(
+        session, opts, collections, workers=1, yoda_version=None, quasi_xml=False, revision_collections=None):
+    '''Prints a list of collections, along with the total size of their data objects,
+       including any data objects in subcollections. Collections can be passed as any iterable,
+       so that rows can be printed before all collections are known.'''
+    format_size = _get_size_formatter(opts.human_readable)
+    totals = defaultdict(int)
+    num_collections = 0
+    with buffered_stdout() as output:
+        for collection, size_result in _get_collection_sizes(
+                session, opts, collections, workers, yoda_version, quasi_xml, revision_collections):
+            num_collections += 1
 
             for group, raw_size in size_result.items():
                 _print_entry(
                     output,
                     collection,
                     group,
-                    raw_size,
-                    group_by,
-                    human_readable)
+                    format_size(raw_size),
+                    opts.group_by)
 
-                if group in totals:
-                    totals[group] = totals[group] + raw_size
-                else:
-                    totals[group] = raw_size
+                totals[group] += raw_size
 
-        except exceptions.NotFoundException:
-            exit_with_error(session, "Error: collection {} not found (or access denied).".format(
-                collection))
+            if num_collections % FLUSH_INTERVAL == 0:
+                output.flush()
 
-    if len(list(collections)) > 1:
-        # Print total size per group if the output is about multiple
-        # collections.
-        if len(totals.items()) > 1:
-            totals.pop('all', None)
+        if num_collections > 1:
+            # Print total size per group if the output is about multiple
+            # collections.
+            if len(totals) > 1:
+                totals.pop('all', None)
 
-        for group, raw_size in totals.items():
-            _print_entry(
-                output,
-                'total',
-                group,
-                raw_size,
-                group_by,
-                human_readable)
+            for group, raw_size in totals.items():
+                _print_entry(
+                    output,
+                    'total',
+                    group,
+                    format_size(raw_size),
+                    opts.group_by)
 
 
 def _get_all_collections_in_home(session):
-    '''Returns a list of the names of all collection names in the home collection.'''
+    '''Returns a generator of the names of all collection names in the home collection.'''
     home_collection = "/{}/home".format(session.zone)
     collections = (session.query(Collection.name)
                    .filter(Collection.parent_name == home_collection)
                    .get_results())
-    return [c[Collection.name] for c in collections]
+    return (c[Collection.name] for c in collections)
 
 
 def _get_research_collection_for_username(session, name):
@@ -166,22 +205,25 @@ def _username_refers_to_research_collection(name):
 def _get_all_root_collections_in_community(session, community):
     '''Returns a list of all root collections in a Yoda community/category.'''
     results = []
+    # Existence of collections is checked against a list of all collections in the
+    # home collection, rather than with a separate query for each collection.
+    existing_collections = frozenset(_get_all_collections_in_home(session))
     # Community information is stored by Yoda in user objects. So first search
     # for user objects, and get the collection names from there.
-    for user in session.query(User.name, UserMeta).filter(
+    for user in session.query(User.name).filter(
             UserMeta.name == 'category', UserMeta.value == community).get_results():
 
         research_collection = _get_research_collection_for_username(
             session, user[User.name])
 
-        if collection_exists(session, research_collection):
+        if research_collection in existing_collections:
             results.append(research_collection)
 
         if _username_refers_to_research_collection(user[User.name]):
             vault_collection = _get_vault_collection_for_username(
                 session, user[User.name])
 
-            if collection_exists(session, vault_collection):
+            if vault_collection in existing_collections:
                 results.append(vault_collection)
 
     if len(results) == 0:
@@ -191,13 +233,21 @@ def _get_all_root_collections_in_community(session, community):
 
 
 def report_size(args, session):
+    opts = ReportOpts(args.human_readable, args.count_all_replicas, args.group_by, args.include_revisions)
+
+    # When reporting on multiple collections, existence of their revision collections
+    # is checked against a single listing, rather than with a query per collection.
+    if args.include_revisions and not args.collection:
+        revision_collections = get_revision_collections(session)
+    else:
+        revision_collections = None
+    parallel_args = (args.workers, args.yoda_version, args.quasi_xml, revision_collections)
+
     if args.collection:
-        _report_size_collections(
-            session, args.human_readable, args.count_all_replicas, args.group_by, args.include_revisions, [
-                args.collection])
+        # A single collection does not benefit from parallel workers.
+        _report_size_collections(session, opts, [args.collection], 1, args.yoda_version, args.quasi_xml)
     elif args.all_collections_in_home:
-        _report_size_collections(session, args.human_readable, args.count_all_replicas, args.group_by, args.include_revisions,
-                                 _get_all_collections_in_home(session))
+        _report_size_collections(session, opts, _get_all_collections_in_home(session), *parallel_args)
     elif args.community:
         try:
             collections = _get_all_root_collections_in_community(session,
@@ -206,10 +256,4 @@ def report_size(args, session):
             exit_with_error(session, "Error: community {} not found.".format(
                 args.community))
 
-        _report_size_collections(
-            session,
-            args.human_readable,
-            args.count_all_replicas,
-            args.group_by,
-            args.include_revisions,
-            collections)
+        _report_size_collections(session, opts, collections, *parallel_args)
@@ -8,9 +8,9 @@ import sys
 from yclienttools import session as s
 from yclienttools import common_args, common_config
 from yclienttools.common_file_ops import remove_collection_data
-from yclienttools.common_queries import get_collections_in_root, get_collection_size
+from yclienttools.common_queries import collection_exists, collection_is_empty
 from yclienttools.common_rules import RuleInterface
-from yclienttools.options import GroupByOption
+from yclienttools.yoda_names import is_valid_groupname
 
 
 def _get_args():
@@ -32,6 +32,8 @@ def _get_args():
                         help="Dry run mode: show what action would be taken.")
     parser.add_argument('--continue-failure', '-C', action='store_true', default=False,
                         help="Continue if operations to remove collections or data objects return an error code")
+    parser.add_argument("-w", "--workers", default=8, type=int,
+                        help='Number of groups to validate in parallel, each using its own iRODS session (default: 8)')
     return parser.parse_args()
 
 
@@ -65,38 +67,70 @@ def entry():
 
 
 def validate_data(session, rule_interface, args, groupdata):
+    if args.workers <= 1 or len(groupdata) <= 1:
+        group_errors = [_validate_group(session, rule_interface, args, group) for group in groupdata]
+    else:
+        group_errors = _validate_groups_in_parallel(args, groupdata)
+
+    return [error for errors in group_errors for error in errors]
+
+
+def _validate_group(session, rule_interface, args, group):
+    '''Returns a list of validation errors for a single group.'''
     errors = []
 
-    for group in groupdata:
-        if args.verbose:
-            print(f"Validating group {group} ...")
-        if not rule_interface.call_uuGroupExists(group):
-            errors.append(f"Group {group} does not exist.")
-        elif not group_collection_exists(session, group):
-            errors.append(f"Group collection {group} does not exist")
-        elif not (args.remove_data or group_is_empty(session, group)):
-            message = f"Group {group} is not empty. Need to use --remove-data to remove its contents."
-            errors.append(message)
+    if args.verbose:
+        print(f"Validating group {group} ...")
+    if not rule_interface.call_uuGroupExists(group):
+        errors.append(f"Group {group} does not exist.")
+    elif not group_collection_exists(session, group):
+        errors.append(f"Group collection {group} does not exist")
+    elif not (args.remove_data or group_is_empty(session, group)):
+        message = f"Group {group} is not empty. Need to use --remove-data to remove its contents."
+        errors.append(message)
 
     return errors
 
 
+def _validate_groups_in_parallel(args, groupdata):
+    '''Validates groups on a thread pool. Each worker thread uses its own iRODS session
+       and rule interface, since iRODS sessions are not thread-safe.'''
+    yoda_version = args.yoda_version if args.yoda_version is not None else common_config.get_default_yoda_version()
+
+    def _setup_worker(worker_session):
+        return worker_session, RuleInterface(worker_session, yoda_version)
+
+    def _validate_group_in_worker(worker, group):
+        worker_session, rule_interface = worker
+        return _validate_group(worker_session, rule_interface, args, group)
+
+    return list(s.map_with_worker_sessions(_validate_group_in_worker, groupdata, args.workers,
+                                           args.yoda_version, setup_worker=_setup_worker))
+
+
 def remove_groups(session, rule_interface, args, groups):
+    # Safety checks, for all groups before any of them is removed
     for group in groups:
-
-        # Safety checks
         if group == "":
             _exit_with_error("Cannot process empty group name")
-        elif "/" in group or ".." in group:
-            _exit_with_error("Refusing to process group name containing slash or dot dot, for safety reasons.")
+        elif not is_valid_groupname(group):
+            _exit_with_error(f"Refusing to process group name {group} with characters other than letters, "
+                             "digits and dashes, for safety reasons.")
 
+    for group in groups:
         if args.verbose:
             print(f"Processing group {group} ...")
-            print(f"Verifying whether group {group} is empty ...")
 
-        group_empty = group_is_empty(session, group)
-        if args.verbose:
-            print(f"Group {group} is " + ("empty" if group_empty else "not empty"))
+        if args.remove_data:
+            if args.verbose:
+                print(f"Verifying whether group {group} is empty ...")
+            group_empty = group_is_empty(session, group)
+            if args.verbose:
+                print(f"Group {group} is " + ("empty" if group_empty else "not empty"))
+        else:
+            # Validation has already verified that the group is empty, since
+            # groups with data are only accepted with --remove-data.
+            group_empty = True
 
         if not group_empty:
             group_coll = f"/{session.zone}/home/{group}"
@@ -151,27 +185,19 @@ def remove_group_contents(session, rule_interface, group, verbose, dry_run, cont
 
 def group_collection_exists(session, group):
     group_collection = f"/{session.zone}/home/{group}"
-    return len(list(get_collections_in_root(session, group_collection))) > 0
+    return collection_exists(session, group_collection)
 
 
 def group_is_empty(session, group):
     group_collection = f"/{session.zone}/home/{group}"
-    num_collections = len(list(get_collections_in_root(session, group_collection)))
-    num_objects = get_collection_size(session, group_collection, False, GroupByOption.none, False)['all']
-    return num_collections <= 1 and num_objects == 0
+    return collection_is_empty(session, group_collection)
 
 
 def parse_group_file(groupfile):
-    groups = []
-
-    if not os.path.isfile(groupfile):
-        _exit_with_error("Group file {} does not exist or is not a regular file.".format(groupfile))
-
     with _open_file_or_stdin(groupfile, "r") as input:
-        for line in input:
-            group = line.strip().lower()
-            if group != "":
-                groups.append(group)
+        # Blank lines are skipped, and duplicates are removed while keeping the original order.
+        groups = list(dict.fromkeys(line.strip().lower() for line in input.read().splitlines()))
+        groups = [group for group in groups if group != ""]
 
     if len(groups) == 0:
         _exit_with_error("Group file has no groups.")
@@ -8,9 +8,8 @@ import sys
 
 from yclienttools import session as s
 from yclienttools import common_args, common_config
-from yclienttools.common_queries import get_collections_in_root, get_collection_size
+from yclienttools.common_queries import collection_exists, collection_is_empty
 from yclienttools.common_rules import RuleInterface
-from yclienttools.options import GroupByOption
 
 
 def _get_args():
@@ -28,6 +27,8 @@ def _get_args():
                         help='Verbose mode: print additional debug information.')
     parser.add_argument('--dry-run', '-d', action='store_true', default=False,
                         help="Dry run mode: show what action would be taken.")
+    parser.add_argument("-w", "--workers", default=8, type=int,
+                        help='Number of users to validate and remove in parallel (default: 8)')
     return parser.parse_args()
 
 
@@ -36,32 +37,77 @@ def _get_format_help_text():
 
 
 def validate_data(session, rule_interface, args, userdata):
+    if args.workers <= 1 or len(userdata) <= 1:
+        user_errors = [_validate_user(session, rule_interface, args, user) for user in userdata]
+    else:
+        user_errors = _validate_users_in_parallel(args, userdata)
+
+    return [error for errors in user_errors for error in errors]
+
+
+def _validate_user(session, rule_interface, args, user):
+    '''Returns a list of validation errors for a single user.'''
     errors = []
 
-    for user in userdata:
-        if not rule_interface.call_rule_user_exists(user):
-            errors.append(f"User {user} does not exist.")
-        if home_exists(session, user) and not home_is_empty(session, user):
-            errors.append(f"Home directory of user {user} is not empty")
-        if trash_exists(session, user) and not trash_is_empty(session, user):
-            errors.append(f"Trash directory of user {user} is not empty")
+    if not rule_interface.call_rule_user_exists(user):
+        errors.append(f"User {user} does not exist.")
+    if home_exists(session, user) and not home_is_empty(session, user):
+        errors.append(f"Home directory of user {user} is not empty")
+    if trash_exists(session, user) and not trash_is_empty(session, user):
+        errors.append(f"Trash directory of user {user} is not empty")
 
     return errors
 
 
+def _validate_users_in_parallel(args, userdata):
+    '''Validates users on a thread pool. Each worker thread uses its own iRODS session
+       and rule interface, since iRODS sessions are not thread-safe.'''
+    yoda_version = args.yoda_version if args.yoda_version is not None else common_config.get_default_yoda_version()
+
+    def _setup_worker(worker_session):
+        return worker_session, RuleInterface(worker_session, yoda_version)
+
+    def _validate_user_in_worker(worker, user):
+        worker_session, rule_interface = worker
+        return _validate_user(worker_session, rule_interface, args, user)
+
+    return list(s.map_with_worker_sessions(_validate_user_in_worker, userdata, args.workers,
+                                           args.yoda_version, setup_worker=_setup_worker))
+
+
 def remove_users(rule_interface, args, users, verbose, dry_run):
-    for user in users:
+    def _announce_removal(user):
         if verbose or dry_run:
             prefix = "Removing" if verbose else "Would remove"
             print(f"{prefix} user {user} ...")
-        if not dry_run:
-            p = subprocess.Popen(["iadmin", "rmuser", user])
-            p.communicate()
-            if (p.returncode == 0):
-                if verbose:
-                    print(f"User {user} has been successfully removed")
-            else:
-                _print_error(f"Error code during removing user {user}: {str(p.returncode)}.")
+
+    def _remove_user(user):
+        '''Removes a user using iadmin. Returns the return code and output of iadmin, so that
+           results can be printed in input order if users are removed in parallel.'''
+        p = subprocess.Popen(["iadmin", "rmuser", user], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        stdout, stderr = p.communicate()
+        return p.returncode, stdout, stderr
+
+    def _report_removal(user, returncode, stdout, stderr):
+        print(stdout, end="")
+        print(stderr, end="", file=sys.stderr)
+        if (returncode == 0):
+            if verbose:
+                print(f"User {user} has been successfully removed")
+        else:
+            _print_error(f"Error code during removing user {user}: {str(returncode)}.")
+
+    # Each removal runs in its own iadmin process, so several of them can run at the same
+    # time, rather than waiting for each process to start, authenticate and finish in turn.
+    if args.workers <= 1 or dry_run:
+        for user in users:
+            _announce_removal(user)
+            if not dry_run:
+                _report_removal(user, *_remove_user(user))
+    else:
+        for user, result in zip(users, s.map_in_threads(_remove_user, users, args.workers)):
+            _announce_removal(user)
+            _report_removal(user, *result)
 
 
 def entry():
@@ -90,14 +136,10 @@ def entry():
 
 
 def parse_user_file(userfile):
-    users = []
-
-    if not os.path.isfile(userfile):
-        _exit_with_error("User file {} does not exist or is not a regular file.".format(userfile))
-
     with _open_file_or_stdin(userfile, "r") as input:
-        for line in input:
-            users.append(line.strip().lower())
+        # Blank lines are skipped, and duplicates are removed while keeping the original order.
+        users = list(dict.fromkeys(line.strip().lower() for line in input.read().splitlines()))
+        users = [user for user in users if user != ""]
 
     if len(users) == 0:
         _exit_with_error("User file has no users.")
@@ -123,26 +165,22 @@ def _open_file_or_stdin(filename, mode):
 
 def home_exists(session, user):
     home_collection = f"/{session.zone}/home/{user}"
-    return len(list(get_collections_in_root(session, home_collection))) > 0
+    return collection_exists(session, home_collection)
 
 
 def home_is_empty(session, user):
     home_collection = f"/{session.zone}/home/{user}"
-    num_collections = len(list(get_collections_in_root(session, home_collection)))
-    num_objects = get_collection_size(session, home_collection, False, GroupByOption.none, False)['all']
-    return num_collections <= 1 and num_objects == 0
+    return collection_is_empty(session, home_collection)
 
 
 def trash_exists(session, user):
     trash_collection = f"/{session.zone}/trash/home/{user}"
-    return len(list(get_collections_in_root(session, trash_collection))) > 0
+    return collection_exists(session, trash_collection)
 
 
 def trash_is_empty(session, user):
     trash_collection = f"/{session.zone}/trash/home/{user}"
-    num_collections = len(list(get_collections_in_root(session, trash_collection)))
-    num_objects = get_collection_size(session, trash_collection, False, GroupByOption.none, False)['all']
-    return num_collections <= 1 and num_objects == 0
+    return collection_is_empty(session, trash_collection)
 
 
 def _print_error(message):
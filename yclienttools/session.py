@@ -1,11 +1,16 @@
+import functools
 import json
 import os
 import ssl
 import sys
+import threading
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from getpass import getpass
 
 from irods import password_obfuscation
+from irods.message import (ET, XML_Parser_Type)
 from irods.session import iRODSSession
 
 from yclienttools import common_config
@@ -18,27 +23,11 @@ def setup_session(yoda_version_override):
     require_ssl = yoda_version != "1.7"
     ca_file = common_config.get_ca_file()
 
-    env_json = os.path.expanduser("~/.irods/irods_environment.json")
-    try:
-        with open(env_json, 'r') as f:
-            irods_env = json.load(f)
-    except OSError:
-        sys.exit("Can not find or access {}. Please use iinit".format(env_json))
-
-    irodsA = os.path.expanduser("~/.irods/.irodsA")
-    try:
-        with open(irodsA, "r") as r:
-            scrambled_password = r.read()
-            password = password_obfuscation.decode(scrambled_password)
-    except OSError:
-        print(
-            "Could not open {} .".format(irodsA),
-            file=sys.stderr
-        )
-        password = getpass(prompt="Please provide your irods password:")
+    irods_env = _load_irods_environment()
+    password = _load_password()
 
     if require_ssl:
-        ssl_context = ssl.create_default_context(purpose=ssl.Purpose.SERVER_AUTH, cafile=ca_file, capath=None, cadata=None)
+        ssl_context = _load_ssl_context(ca_file)
         ssl_settings = {'client_server_negotiation': 'request_server_negotiation',
                         'client_server_policy': 'CS_NEG_REQUIRE',
                         'encryption_algorithm': 'AES-256-CBC',
@@ -64,3 +53,139 @@ def setup_session(yoda_version_override):
         )
 
     return session
+
+
+# The environment file, password and SSL context are loaded once per process, so that
+# setting up additional sessions (e.g. one per worker thread) does not read and parse
+# them again, or prompt for the password again.
+@functools.lru_cache(maxsize=1)
+def _load_irods_environment():
+    """:returns: contents of the iRODS environment file"""
+    env_json = os.path.expanduser("~/.irods/irods_environment.json")
+    try:
+        with open(env_json, 'r') as f:
+            irods_env = json.load(f)
+    except OSError:
+        sys.exit("Can not find or access {}. Please use iinit".format(env_json))
+
+    return irods_env
+
+
+@functools.lru_cache(maxsize=1)
+def _load_password():
+    """:returns: iRODS password, from the scrambled password file or entered by the user"""
+    irodsA = os.path.expanduser("~/.irods/.irodsA")
+    try:
+        with open(irodsA, "r") as r:
+            scrambled_password = r.read()
+            password = password_obfuscation.decode(scrambled_password)
+    except OSError:
+        print(
+            "Could not open {} .".format(irodsA),
+            file=sys.stderr
+        )
+        password = getpass(prompt="Please provide your irods password:")
+
+    return password
+
+
+@functools.lru_cache(maxsize=4)
+def _load_ssl_context(ca_file):
+    """:returns: SSL context for verifying the server certificate using a CA file"""
+    return ssl.create_default_context(purpose=ssl.Purpose.SERVER_AUTH, cafile=ca_file, capath=None, cadata=None)
+
+
+class SessionPerThread:
+    """Provides a separate iRODS session for each thread that uses it, since
+       iRODS sessions are not thread-safe. Sessions are created on first use."""
+
+    def __init__(self, yoda_version_override, quasi_xml=False):
+        """constructor
+
+           :param yoda_version_override: Yoda version to use for the sessions (None for default)
+           :param quasi_xml: whether to enable the Quasi-XML parser in each thread
+        """
+        self.yoda_version_override = yoda_version_override
+        self.quasi_xml = quasi_xml
+        self.thread_data = threading.local()
+        self.sessions = []
+        self.sessions_lock = threading.Lock()
+
+    def get(self):
+        """:returns: iRODS session of the current thread"""
+        if not hasattr(self.thread_data, "session"):
+            session = setup_session(self.yoda_version_override)
+            if self.quasi_xml:
+                ET(XML_Parser_Type.QUASI_XML, session.server_version)
+            with self.sessions_lock:
+                self.sessions.append(session)
+            self.thread_data.session = session
+        return self.thread_data.session
+
+    def cleanup(self):
+        """Cleans up the sessions of all threads"""
+        with self.sessions_lock:
+            for session in self.sessions:
+                session.cleanup()
+            self.sessions = []
+
+
+def map_in_threads(function, items, workers):
+    """Applies a function to items on a thread pool, and yields the results in the order
+       of the items. Items are taken from the iterable as results are yielded, with a
+       lookahead of a few items per worker, so that items can be generated lazily and the
+       first result is yielded before all items are known. If an exception occurs, either
+       in a worker thread or in the caller (e.g. KeyboardInterrupt, or the generator being
+       closed), items that have not been started yet are cancelled, so that only items that
+       are already running are waited for.
+
+       :param function: function to apply to each item
+       :param items: iterable of items
+       :param workers: number of worker threads
+
+       :returns: generator of results
+    """
+    max_pending = 2 * workers
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def map_with_worker_sessions(function, items, workers, yoda_version_override, quasi_xml=False, setup_worker=None):
+    """Applies a function to items on a thread pool, with a separate iRODS session for each
+       worker thread, and yields the results in the order of the items (see map_in_threads).
+
+       :param function: function to apply, called as function(session, item)
+       :param items: iterable of items
+       :param workers: number of worker threads
+       :param yoda_version_override: Yoda version to use for the sessions (None for default)
+       :param quasi_xml: whether to enable the Quasi-XML parser in each thread
+       :param setup_worker: optional function that is called once for each worker thread with
+                            its session. If provided, its result is passed to the function
+                            instead of the session.
+
+       :returns: generator of results
+    """
+    worker_sessions = SessionPerThread(yoda_version_override, quasi_xml)
+    thread_data = threading.local()
+
+    def _apply_in_worker(item):
+        if not hasattr(thread_data, "worker"):
+            session = worker_sessions.get()
+            thread_data.worker = session if setup_worker is None else setup_worker(session)
+        return function(thread_data.worker, item)
+
+    try:
+        yield from map_in_threads(_apply_in_worker, items, workers)
+    finally:
+        worker_sessions.cleanup()
@@ -2,6 +2,7 @@
 
 import argparse
 import sys
+from operator import itemgetter
 from irods.models import User, UserGroup
 from yclienttools import common_args, common_config, common_queries
 from yclienttools import session as s
@@ -24,8 +25,9 @@ def entry():
             UserGroup.name).filter(
                 User.name == args.username).get_results()
 
-        for group in sorted(list(map(lambda g: g[UserGroup.name], groups))):
-            print(group)
+        group_names = sorted(map(itemgetter(UserGroup.name), groups))
+        if group_names:
+            sys.stdout.write("\n".join(group_names) + "\n")
 
         session.cleanup()
 
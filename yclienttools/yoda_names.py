@@ -6,16 +6,18 @@
 __copyright__ = 'Copyright (c) 2019-2024, Utrecht University'
 __license__   = 'GPLv3, see LICENSE'
 
-import dns.resolver as resolver
 import re
-from typing import List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import AbstractSet, Iterable, Optional, Tuple
 
-from datetime import datetime
+from datetime import date
+from functools import lru_cache
 
-try:
-    from functools import lru_cache
-except ImportError:
-    from backports.functools_lru_cache import lru_cache  # type: ignore[no-redef]
+# Patterns are compiled once, since the validation functions are called for each
+# line of (potentially large) import files.
+CATEGORY_PATTERN = re.compile(r"^[a-zA-Z0-9\-_]+$")
+GROUPNAME_PATTERN = re.compile(r"^[a-zA-Z0-9\-]+$")
+SCHEMA_ID_PATTERN = re.compile(r"^[a-zA-Z0-9\-]+\-[0-9]+$")
 
 
 def is_valid_username(username: str, no_validate_domains: bool) -> Tuple[bool, Optional[str]]:
@@ -38,34 +40,71 @@ def is_valid_username(username: str, no_validate_domains: bool) -> Tuple[bool, O
 
 
 def is_email(username: str) -> bool:
-    return re.search(r"@.*[^\.]+\.[^\.]+$", username) is not None
+    # Equivalent to searching for r"@.*[^\.]+\.[^\.]+$" in a single line, without the
+    # backtracking: the last dot must be followed by at least one character, and be
+    # preceded by a character other than a dot, which comes after the first @.
+    at_index = username.find("@")
+    dot_index = username.rfind(".")
+    return (0 <= at_index < dot_index - 1
+            and dot_index < len(username) - 1
+            and username[dot_index - 1] != ".")
 
 
-@lru_cache(maxsize=100)
+@lru_cache(maxsize=4096)
 def is_valid_domain(domain: str) -> bool:
+    # dnspython is imported here rather than at module level, since it is relatively
+    # slow to import and only needed if domains are validated.
+    import dns.resolver as resolver
+
     try:
-        return bool(resolver.query(domain, "MX"))
+        return bool(resolver.resolve(domain, "MX"))
     except (resolver.NXDOMAIN, resolver.NoAnswer):
         return False
 
 
+def prefetch_domain_validation(usernames: Iterable[str], max_workers: int = 16) -> None:
+    """Validates the email domains of a list of usernames concurrently, so that subsequent
+    calls to is_valid_username for these usernames can use cached results.
+
+    :param usernames: usernames to validate the domains of
+    :param max_workers: maximum number of concurrent DNS lookups
+    """
+    domains = {username.split("@")[1] for username in usernames if is_email(username)}
+    if len(domains) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_try_is_valid_domain, domains))
+
+
+def _try_is_valid_domain(domain: str) -> None:
+    # Errors are ignored here. Results of failed lookups are not cached, so the lookup
+    # is done again by is_valid_username, which reports any error as before.
+    try:
+        is_valid_domain(domain)
+    except Exception:
+        pass
+
+
 def is_valid_category(name: str) -> bool:
     """Is this name a valid (sub)category name?"""
-    return re.search(r"^[a-zA-Z0-9\-_]+$", name) is not None
+    return CATEGORY_PATTERN.search(name) is not None
 
 
 def is_valid_groupname(name: str) -> bool:
     """Is this name a valid group name (prefix such as "research-" can be omitted)"""
-    return re.search(r"^[a-zA-Z0-9\-]+$", name) is not None
+    return GROUPNAME_PATTERN.search(name) is not None
 
 
-def is_internal_user(username: str, internal_domains: List[str]) -> bool:
-    for domain in internal_domains:
-        domain_pattern = "@{}$".format(domain)
-        if re.search(domain_pattern, username) is not None:
-            return True
+def is_internal_user(username: str, internal_domains: AbstractSet[str]) -> bool:
+    """Is this user in one of the internal email domains?
 
-    return False
+    :param username: Name of the user
+    :param internal_domains: Set of internal email domains, built once by the caller
+
+    :returns: Indication whether the user is in one of the internal domains
+    """
+    if "@" not in username:
+        return False
+    return username.rpartition("@")[2] in internal_domains
 
 
 def is_valid_expiration_date(expiration_date: str) -> bool:
@@ -80,21 +119,21 @@ def is_valid_expiration_date(expiration_date: str) -> bool:
         return True
 
     try:
-        if expiration_date != datetime.strptime(expiration_date, "%Y-%m-%d").strftime(
-            "%Y-%m-%d"
-        ):
-            raise ValueError
-
-        # Expiration date should be in the future
-        if expiration_date <= datetime.now().strftime("%Y-%m-%d"):
-            raise ValueError
-        return True
+        parsed_date = date.fromisoformat(expiration_date)
     except ValueError:
         return False
 
+    # Only YYYY-MM-DD is accepted, whereas date.fromisoformat accepts other ISO 8601
+    # formats as well in recent Python versions.
+    if parsed_date.isoformat() != expiration_date:
+        return False
+
+    # Expiration date should be in the future
+    return parsed_date > date.today()
+
 
 def is_valid_schema_id(schema_id: str) -> bool:
     """Is this schema at least a correctly formatted schema-id?"""
     if schema_id == "":
         return True
-    return re.search(r"^[a-zA-Z0-9\-]+\-[0-9]+$", schema_id) is not None
+    return SCHEMA_ID_PATTERN.search(schema_id) is not None